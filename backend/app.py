@@ -30,13 +30,14 @@ else:
     print("❌ No Google API key found in environment variables!")
 
 import openai
+import httpx
 from google import generativeai as genai
 
 # Configure Google API
 genai.configure(api_key=google_api_key)
 
 from fastapi import FastAPI, File, UploadFile, Form, Depends, HTTPException, status
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List, Optional
 import uvicorn
@@ -45,20 +46,161 @@ import os
 import subprocess
 import time
 import random
-import math
 import concurrent.futures
+import copy
+import multiprocessing
 import base64
+import hashlib
+import heapq
 import re
 import requests
 import json
 import io
+import csv
 from docx import Document
 from docx.shared import Inches, Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from datetime import datetime
 import threading
-
-app = FastAPI(title="PV Generation API")
+import asyncio
+import functools
+import itertools
+import collections
+import shutil
+import sqlite3
+import uuid
+from contextlib import asynccontextmanager, closing
+import numpy as np
+from pypdf import PdfReader, PdfWriter
+from image_preprocessing import OCR_MAX_IMAGE_SIDE, OCR_JPEG_QUALITY, preprocess_ocr_image
+
+# Shared pool for blocking work (ffmpeg, downloads, sync SDK calls), so it never runs on the event loop
+BLOCKING_WORKERS = int(os.environ.get("BLOCKING_WORKERS", "32"))
+blocking_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=BLOCKING_WORKERS, thread_name_prefix="pv-blocking"
+)
+# Small separate pool for the job and session store (SQLite and job files), so status polls
+# and progress updates never queue behind pipeline stages holding every blocking_executor thread
+STORE_WORKERS = int(os.environ.get("STORE_WORKERS", "2"))
+store_executor = concurrent.futures.ThreadPoolExecutor(max_workers=STORE_WORKERS, thread_name_prefix="pv-store")
+
+# Global caps on in-flight API calls per provider, shared by every request and source.
+# Whisper calls are paced by whisper_scheduler, which starts at the OpenAI limit and adapts it.
+PROVIDER_CONCURRENCY = {
+    "openai": int(os.environ.get("OPENAI_MAX_CONCURRENCY", "5")),
+    "gemini": int(os.environ.get("GEMINI_MAX_CONCURRENCY", "8")),
+}
+class ProviderLimit:
+    """Cap on in-flight calls to one provider, shared by worker threads and coroutines.
+
+    Callers are served first come, first served: a released slot is handed to the
+    oldest waiter, thread or coroutine, instead of going to whoever grabs it first.
+    Threads use `with limit:`; coroutines use `async with provider_slot(...)`, which
+    waits without holding an executor thread.
+    """
+
+    def __init__(self, limit):
+        self._lock = threading.Lock()
+        self._available = limit
+        self._waiters = collections.deque()  # grant() callables, oldest first
+
+    def acquire(self):
+        with self._lock:
+            if self._available and not self._waiters:
+                self._available -= 1
+                return
+            granted = threading.Event()
+            self._waiters.append(lambda: granted.set() or True)
+        granted.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        granted = False
+
+        def grant():
+            # Called with the lock held, from the releasing thread
+            nonlocal granted
+            try:
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+            except RuntimeError:
+                return False  # The event loop is closed
+            granted = True
+            return True
+
+        with self._lock:
+            if self._available and not self._waiters:
+                self._available -= 1
+                return
+            self._waiters.append(grant)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if not granted:
+                    self._waiters.remove(grant)
+            if granted:
+                # The slot was handed over just as the wait was cancelled: pass it on
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                if self._waiters.popleft()():
+                    return
+            self._available += 1
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+provider_limits = {
+    "gemini": ProviderLimit(PROVIDER_CONCURRENCY["gemini"]),
+}
+
+@asynccontextmanager
+async def provider_slot(provider):
+    """Hold one of the provider's in-flight call slots from a coroutine."""
+    limit = provider_limits[provider]
+    await limit.acquire_async()
+    try:
+        yield
+    finally:
+        limit.release()
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking function on the shared executor without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, functools.partial(func, *args, **kwargs))
+
+async def run_store(func, *args, **kwargs):
+    """Run a job or session store call on store_executor without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(store_executor, functools.partial(func, *args, **kwargs))
+
+@asynccontextmanager
+async def lifespan(app):
+    if openai_api_key and openai_api_key.startswith("sk-"):
+        get_openai_client()
+    job_workers = start_pv_job_workers()
+    init_session_store()
+    prune_transcription_runs()
+    get_pv_document_template()
+    cleanup_task = asyncio.create_task(periodic_cleanup())
+    yield
+    cleanup_task.cancel()
+    for worker in job_workers:
+        worker.cancel()
+    blocking_executor.shutdown(wait=False, cancel_futures=True)
+    store_executor.shutdown(wait=False, cancel_futures=True)
+    shutdown_image_preprocess_executor()
+    close_openai_client()
+
+app = FastAPI(title="PV Generation API", lifespan=lifespan)
 
 # Configuration CORS
 app.add_middleware(
@@ -67,8 +209,432 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Autorise toutes les méthodes HTTP
     allow_headers=["*"],  # Autorise tous les headers
+    expose_headers=["X-PV-Session-Id"],  # ID de session renvoyé par /generate_pv
 )
 
+# --- Caches ---
+
+class DiskCache:
+    """Persistent on-disk key/value cache with size-bounded LRU eviction and optional TTL.
+
+    Each value is stored as a JSON file named after its key. A hit refreshes the
+    file's mtime, so eviction removes the least recently used entries first;
+    entries older than `ttl` seconds (since they were written) are treated as misses.
+    """
+
+    def __init__(self, directory, max_bytes, ttl=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(
+            entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith(".json")
+        )
+
+    @staticmethod
+    def make_key(*parts):
+        """Hash bytes/str parts into a cache key (length-prefixed, so parts cannot run together)."""
+        digest = hashlib.sha256()
+        for part in parts:
+            data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+            digest.update(len(data).to_bytes(8, "big"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if self.ttl is not None and time.time() - entry["created_at"] > self.ttl:
+                raise KeyError("expired")
+            os.utime(path)  # Mark as recently used
+        except (OSError, ValueError, KeyError, TypeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry["value"]
+
+    def set(self, key, value):
+        path = self._path(key)
+        data = json.dumps({"created_at": time.time(), "value": value}, ensure_ascii=False).encode("utf-8")
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp_path, path)
+            self._size += len(data) - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Drop least recently used entries until we are comfortably under the limit
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        target_size = self.max_bytes * 0.9
+        for entry in entries:
+            if self._size <= target_size:
+                break
+            try:
+                entry_size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self._size -= entry_size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+CACHE_DIR = os.environ.get("PV_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pv_cache"))
+
+# Whisper transcripts keyed by chunk bytes + model parameters, so regenerating a PV
+# from the same recording skips every already-transcribed chunk
+WHISPER_MODEL = "whisper-1"
+WHISPER_LANGUAGE = "fr"
+WHISPER_RESPONSE_FORMAT = "text"
+transcript_cache = DiskCache(
+    os.path.join(CACHE_DIR, "transcripts"),
+    max_bytes=int(os.environ.get("TRANSCRIPT_CACHE_MAX_MB", "200")) * 1024 * 1024
+)
+
+# Gemini OCR texts and PDF analyses keyed by file bytes + model + prompt, so the same
+# scans and agenda PDFs uploaded across iterations of a PV are only analysed once
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_MB", "100")) * 1024 * 1024
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL_DAYS", "30")) * 86400
+ocr_cache = DiskCache(os.path.join(CACHE_DIR, "ocr"), RESULT_CACHE_MAX_BYTES, ttl=RESULT_CACHE_TTL)
+pdf_cache = DiskCache(os.path.join(CACHE_DIR, "pdf"), RESULT_CACHE_MAX_BYTES, ttl=RESULT_CACHE_TTL)
+
+# --- Whisper Scheduler ---
+
+# Scheduling priorities (lower runs first): interactive requests go ahead of background jobs
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+def parse_rate_limit_duration(value):
+    """Parse OpenAI reset durations such as "1s", "6m0s" or "250ms" into seconds."""
+    if not value:
+        return None
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute` tokens per minute."""
+
+    def __init__(self, per_minute):
+        self.set_rate(per_minute)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def set_rate(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` tokens are available (requests larger than the bucket only wait for a full one)."""
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    def consume(self, amount):
+        # May go negative: oversized requests are paid back before the next one starts
+        self.tokens -= amount
+
+class WhisperScheduler:
+    """Process-wide scheduler shared by every Whisper call in every request.
+
+    Calls are admitted in (priority, arrival) order when there is a free concurrency
+    slot and both token buckets (requests/minute and audio-seconds/minute) allow it.
+    Concurrency adapts with AIMD: +1/limit after each success, halved on a 429.
+    Rate-limit response headers pause admission until the provider's reset time.
+    """
+
+    def __init__(self, requests_per_minute, audio_seconds_per_minute, initial_concurrency, max_concurrency):
+        self.requests = TokenBucket(requests_per_minute)
+        self.audio_seconds = TokenBucket(audio_seconds_per_minute)
+        self.configured_rpm = requests_per_minute
+        self.limit = float(initial_concurrency)
+        self.max_limit = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.backoff = 5.0
+        self.completed = 0
+        self.rate_limited = 0
+        self._waiting = []
+        self._tickets = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, audio_seconds=0.0, priority=PRIORITY_INTERACTIVE):
+        """Block until this call may start."""
+        with self._cond:
+            ticket = (priority, next(self._tickets))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None  # Woken up by release() when it is not our turn
+                    if self._waiting[0] == ticket and self.in_flight < int(self.limit):
+                        wait = max(
+                            self.paused_until - now,
+                            self.requests.wait_time(1, now),
+                            self.audio_seconds.wait_time(audio_seconds, now)
+                        )
+                        if wait <= 0:
+                            break
+                    self._cond.wait(timeout=wait)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+            self.requests.consume(1)
+            self.audio_seconds.consume(audio_seconds)
+            self.in_flight += 1
+            self._cond.notify_all()  # Let the next caller in line re-check
+
+    def release(self, outcome, headers=None):
+        """Finish a call started with acquire(); outcome is "success", "rate_limited" or "error"."""
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if outcome == "success":
+                self.completed += 1
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.backoff = 5.0
+            elif outcome == "rate_limited":
+                self.rate_limited += 1
+                self.limit = max(1.0, self.limit / 2)
+            if headers is not None:
+                self._observe_headers(headers, now)
+            if outcome == "rate_limited" and self.paused_until <= now:
+                # No usable hint from the provider: back off exponentially
+                self.paused_until = now + self.backoff + random.uniform(0, 1)
+                self.backoff = min(120.0, self.backoff * 2)
+            self._cond.notify_all()
+
+    def _observe_headers(self, headers, now):
+        limit_requests = headers.get("x-ratelimit-limit-requests")
+        if limit_requests and limit_requests.isdigit():
+            self.requests.set_rate(min(self.configured_rpm, int(limit_requests)))
+        retry_after = headers.get("retry-after-ms")
+        retry_after = float(retry_after) / 1000 if retry_after else parse_rate_limit_duration(headers.get("retry-after"))
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        if remaining is not None and remaining.isdigit() and int(remaining) == 0:
+            reset = parse_rate_limit_duration(headers.get("x-ratelimit-reset-requests"))
+            if reset:
+                self.paused_until = max(self.paused_until, now + reset)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "concurrency_limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "waiting": len(self._waiting),
+                "paused_for_seconds": round(max(0.0, self.paused_until - time.monotonic()), 2),
+                "completed": self.completed,
+                "rate_limited": self.rate_limited,
+            }
+
+whisper_scheduler = WhisperScheduler(
+    requests_per_minute=int(os.environ.get("WHISPER_RPM", "50")),
+    audio_seconds_per_minute=int(os.environ.get("WHISPER_AUDIO_SECONDS_PER_MIN", "7200")),
+    initial_concurrency=PROVIDER_CONCURRENCY["openai"],
+    max_concurrency=int(os.environ.get("WHISPER_MAX_CONCURRENCY", "16")),
+)
+
+# --- OpenAI Client ---
+
+# One client and keep-alive pool for the whole process, opened and closed with the app lifespan.
+# The pool is sized so every Whisper call the scheduler may admit can hold its own connection.
+OPENAI_POOL_SIZE = int(os.environ.get("OPENAI_POOL_SIZE", str(int(whisper_scheduler.max_limit))))
+OPENAI_KEEPALIVE_SECONDS = float(os.environ.get("OPENAI_KEEPALIVE_SECONDS", "120"))
+OPENAI_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_TIMEOUT_SECONDS", "120"))
+
+class ConnectionStats:
+    """Counts requests against new TCP connections and TLS handshakes, from httpcore trace events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.connect_seconds = 0.0
+
+    def instrument(self, request):
+        """httpx request hook: attach a trace callback to the outgoing request."""
+        started = {}
+
+        def trace(event_name, info):
+            step, _, phase = event_name.rpartition(".")
+            if step not in ("connection.connect_tcp", "connection.start_tls"):
+                return
+            if phase == "started":
+                started[step] = time.perf_counter()
+            elif phase == "complete":
+                elapsed = time.perf_counter() - started.pop(step, time.perf_counter())
+                with self._lock:
+                    if step == "connection.connect_tcp":
+                        self.new_connections += 1
+                    else:
+                        self.tls_handshakes += 1
+                    self.connect_seconds += elapsed
+
+        request.extensions["trace"] = trace
+        with self._lock:
+            self.requests += 1
+
+    def stats(self):
+        with self._lock:
+            reused = max(0, self.requests - self.new_connections)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": reused,
+                "reuse_ratio": round(reused / self.requests, 3) if self.requests else None,
+                "tls_handshakes": self.tls_handshakes,
+                "avg_connect_ms": round(1000 * self.connect_seconds / self.new_connections, 1) if self.new_connections else None,
+            }
+
+openai_connection_stats = ConnectionStats()
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+def get_openai_client():
+    """Return the shared OpenAI client, creating it and its connection pool on first use."""
+    global _openai_client
+    with _openai_client_lock:
+        if _openai_client is None:
+            if not openai_api_key or not openai_api_key.startswith("sk-"):
+                raise ValueError("Invalid OpenAI API key. Key should start with 'sk-'")
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_POOL_SIZE,
+                    max_keepalive_connections=OPENAI_POOL_SIZE,
+                    keepalive_expiry=OPENAI_KEEPALIVE_SECONDS
+                ),
+                timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=10.0),
+                event_hooks={"request": [openai_connection_stats.instrument]}
+            )
+            # Retries are left to the scheduler, which has to see every 429 to adapt
+            _openai_client = openai.OpenAI(api_key=openai_api_key, max_retries=0, http_client=http_client)
+            print("✅ OpenAI client initialized successfully")
+        return _openai_client
+
+def close_openai_client():
+    """Close the shared OpenAI client and its pooled connections."""
+    global _openai_client
+    with _openai_client_lock:
+        if _openai_client is not None:
+            _openai_client.close()
+            _openai_client = None
+
+# --- Progress Events ---
+
+class StreamClosed(Exception):
+    """Raised in a pipeline thread when the client reading its events has gone away."""
+
+class EventStream:
+    """Thread-safe bridge from a blocking pipeline to an async Server-Sent Events response.
+
+    Pipeline threads call emit(event, data); the response iterates over events().
+    Once the client disconnects, emit raises StreamClosed so the pipeline stops early.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._closed = threading.Event()
+
+    def emit(self, event, data):
+        if self._closed.is_set():
+            raise StreamClosed()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (event, data))
+
+    def close(self):
+        self._closed.set()
+
+    async def events(self):
+        """Yield SSE-formatted events until a "done" or "error" event has been sent."""
+        try:
+            while True:
+                event, data = await self._queue.get()
+                yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+                if event in ("done", "error"):
+                    break
+        finally:
+            self.close()
+
+streaming_tasks = set()  # Keeps streaming response tasks alive until they finish
+
+def event_stream_response(stream):
+    """Serve an EventStream as a text/event-stream response, unbuffered by proxies."""
+    return StreamingResponse(
+        stream.events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def stream_pipeline_events(pipeline, temp_dir):
+    """Run pipeline(events) on the blocking executor and stream its events as SSE.
+
+    The pipeline returns (result, err); it is reported as a final "done" event
+    carrying the result dict or an "error" event. temp_dir is removed once it finishes.
+    """
+    stream = EventStream()
+
+    def run():
+        try:
+            result, err = pipeline(stream.emit)
+            if err:
+                stream.emit("error", {"error": err})
+            else:
+                stream.emit("done", result)
+        except StreamClosed:
+            print("⚠️ Client disconnected, transcription stopped")
+        except Exception as e:
+            print(f"❌ Streaming transcription failed: {str(e)}")
+            try:
+                stream.emit("error", {"error": str(e)})
+            except StreamClosed:
+                pass
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    blocking_executor.submit(run)
+    return event_stream_response(stream)
+
 # --- Helper Functions ---
 
 def extract_file_id_from_url(url):
@@ -84,72 +650,243 @@ def extract_file_id_from_url(url):
             return match.group(1)
     return None
 
-def download_video_from_drive(video_url, output_path):
+DOWNLOAD_WORKERS = int(os.environ.get("DOWNLOAD_WORKERS", "4"))
+DOWNLOAD_PART_SIZE = 16 * 1024 * 1024  # Size of each HTTP Range slice
+DOWNLOAD_BUFFER_SIZE = 1024 * 1024  # Bytes held in memory per connection
+DOWNLOAD_ATTEMPTS = int(os.environ.get("DOWNLOAD_ATTEMPTS", "3"))  # download_file calls per Drive download
+
+def save_download_state(state_path, total, done_parts):
+    """Record which parts of a `.tmp` download are complete, for download_file to resume from."""
+    with open(state_path + ".new", "w") as f:
+        json.dump({"total": total, "done": sorted(done_parts)}, f)
+    os.replace(state_path + ".new", state_path)
+
+def keep_partial_download(output_path, received, total, part_size=DOWNLOAD_PART_SIZE):
+    """Turn the first `received` bytes of a sequential download in `<output_path>.tmp` into a resumable state.
+
+    The file is extended to `total` bytes and the parts it fully covers are recorded,
+    so the next download_file call on `output_path` only fetches the rest.
+    """
+    temp_path = output_path + ".tmp"
+    if not total or not os.path.exists(temp_path):
+        return
+    with open(temp_path, "r+b") as f:
+        f.truncate(total)
+    done_parts = [index for index, start in enumerate(range(0, total, part_size))
+                  if min(start + part_size, total) <= received]
+    save_download_state(temp_path + ".parts", total, done_parts)
+
+def download_file(url, output_path, session=None, headers=None, workers=DOWNLOAD_WORKERS,
+                  part_size=DOWNLOAD_PART_SIZE, max_retries=3, progress=None):
+    """Download a URL with parallel HTTP Range requests into a preallocated file.
+
+    Parts are written into `<output_path>.tmp` and recorded in `<output_path>.tmp.parts`
+    as they complete, so calling this again after a failure resumes the download instead
+    of starting over. Falls back to a single streamed GET when the server does not
+    support ranges. `progress`, if given, is called as progress(downloaded, total, bytes_per_sec).
+
+    Returns (ok, err, stats) where stats holds "bytes", "seconds" and "bytes_per_sec".
+    """
+    session = session or requests.Session()
+    # Range offsets only make sense on the unencoded representation
+    headers = {**(headers or {}), "Accept-Encoding": "identity"}
+    temp_path = output_path + ".tmp"
+    state_path = temp_path + ".parts"
+    started_at = time.time()
+    downloaded = 0
+    lock = threading.Lock()
+
+    def report(chunk_length, total):
+        nonlocal downloaded
+        with lock:
+            downloaded += chunk_length
+            current = downloaded
+        if progress:
+            elapsed = max(time.time() - started_at, 1e-6)
+            progress(current, total, current / elapsed)
+
+    def finish(total):
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        os.replace(temp_path, output_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        seconds = max(time.time() - started_at, 1e-6)
+        stats = {"bytes": total, "seconds": round(seconds, 3), "bytes_per_sec": round(downloaded / seconds)}
+        print(f"⬇️ Downloaded {total / 1e6:.1f} MB in {seconds:.1f} s ({stats['bytes_per_sec'] / 1e6:.2f} MB/s)")
+        return True, None, stats
+
     try:
-        file_id = extract_file_id_from_url(video_url)
-        if not file_id:
-            return False, "URL Google Drive non reconnue."
-        session = requests.Session()
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'fr,fr-FR;q=0.8,en-US;q=0.5,en;q=0.3',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
-        }
-        download_url = f'https://drive.usercontent.google.com/download?id={file_id}&export=download&authuser=0&confirm=t'
-        response = session.get(download_url, headers=headers, stream=True, timeout=30)
-        content_type = response.headers.get('Content-Type', '').lower()
-        if 'text/html' in content_type:
-            # Try alternative URL for large files
-            download_url = f'https://drive.usercontent.google.com/download?id={file_id}&export=download&authuser=0&confirm=t&uuid=123&at=123'
-            response = session.get(download_url, headers=headers, stream=True, timeout=30)
-            content_type = response.headers.get('Content-Type', '').lower()
-            if 'text/html' in content_type:
-                return False, "Impossible d'accéder au fichier. Vérifiez les droits de partage."
-        temp_path = output_path + ".tmp"
-        try:
-            chunk_size = 500 * 1024 * 1024
-            downloaded_size = 0
-            expected_size = None
-            if 'content-length' in response.headers:
-                expected_size = int(response.headers['content-length'])
-            with open(temp_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=chunk_size):
+        probe = session.get(url, headers={**headers, "Range": "bytes=0-0"}, stream=True, timeout=30)
+        probe.close()
+        content_range = probe.headers.get("Content-Range", "")
+        if probe.status_code != 206 or "/" not in content_range or content_range.endswith("/*"):
+            # No range support: stream the whole file through a bounded buffer
+            print("⚠️ Server does not support range requests, using a single connection")
+            response = session.get(url, headers=headers, stream=True, timeout=30)
+            response.raise_for_status()
+            total = int(response.headers.get("Content-Length", 0)) or None
+            with open(temp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_BUFFER_SIZE):
                     if chunk:
                         f.write(chunk)
-                        downloaded_size += len(chunk)
-            # Check file
-            if os.path.exists(temp_path):
-                file_size = os.path.getsize(temp_path)
-                if file_size < 10000:
-                    os.remove(temp_path)
-                    return False, "Fichier téléchargé trop petit."
-                # Optionally: check VRO header (not enforced here)
+                        report(len(chunk), total)
+            return finish(os.path.getsize(temp_path))
+
+        total = int(content_range.rsplit("/", 1)[1])
+        parts = [(start, min(start + part_size, total) - 1) for start in range(0, total, part_size)]
+
+        # Resume from a previous partial download of the same file if there is one
+        done_parts = set()
+        if os.path.exists(temp_path) and os.path.exists(state_path):
+            try:
+                with open(state_path) as f:
+                    state = json.load(f)
+                if state.get("total") == total and os.path.getsize(temp_path) == total:
+                    done_parts = set(state.get("done", []))
+            except (OSError, ValueError):
+                done_parts = set()
+        if done_parts:
+            print(f"🔁 Resuming download: {len(done_parts)}/{len(parts)} parts already on disk")
+        else:
+            with open(temp_path, "wb") as f:
+                f.truncate(total)
+
+        def fetch_part(index):
+            start, end = parts[index]
+            delay = 1
+            for attempt in range(max_retries):
+                written = 0
                 try:
-                    if os.path.exists(output_path):
-                        os.remove(output_path)
-                    os.rename(temp_path, output_path)
+                    response = session.get(url, headers={**headers, "Range": f"bytes={start}-{end}"},
+                                           stream=True, timeout=30)
+                    if response.status_code != 206:
+                        raise IOError(f"Unexpected status {response.status_code} for range {start}-{end}")
+                    with open(temp_path, "r+b") as f:
+                        f.seek(start)
+                        for chunk in response.iter_content(chunk_size=DOWNLOAD_BUFFER_SIZE):
+                            if chunk:
+                                f.write(chunk)
+                                written += len(chunk)
+                                report(len(chunk), total)
+                    if written != end - start + 1:
+                        raise IOError(f"Incomplete range {start}-{end}: got {written} bytes")
+                    with lock:
+                        done_parts.add(index)
+                        save_download_state(state_path, total, done_parts)
+                    return
                 except Exception as e:
-                    import shutil
-                    try:
-                        shutil.copy2(temp_path, output_path)
-                        os.remove(temp_path)
-                    except Exception as e2:
-                        return False, f"Erreur lors de la copie: {str(e2)}"
-                return True, None
-            else:
-                return False, "Erreur lors de l'écriture du fichier."
-        except Exception as e:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            return False, f"Erreur pendant le téléchargement: {str(e)}"
+                    report(-written, total)
+                    if attempt == max_retries - 1:
+                        raise
+                    print(f"⚠️ Range {start}-{end} failed (attempt {attempt + 1}/{max_retries}): {str(e)}")
+                    time.sleep(delay)
+                    delay *= 2
+
+        pending_parts = [index for index in range(len(parts)) if index not in done_parts]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending_parts)))) as executor:
+            futures = [executor.submit(fetch_part, index) for index in pending_parts]
+            errors = []
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append(str(e))
+        if errors:
+            # Keep the .tmp file and its part list so the next attempt resumes from here
+            return False, f"{len(errors)} part(s) failed: {errors[0]}", None
+        return finish(total)
+
+    except Exception as e:
+        return False, str(e), None
+
+def open_drive_download(video_url):
+    """Resolve a Google Drive sharing URL into a streaming download response.
+
+    Returns (session, headers, response, err); the response body has not been read yet.
+    """
+    file_id = extract_file_id_from_url(video_url)
+    if not file_id:
+        return None, None, None, "URL Google Drive non reconnue."
+    session = requests.Session()
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'fr,fr-FR;q=0.8,en-US;q=0.5,en;q=0.3',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1'
+    }
+    download_url = f'https://drive.usercontent.google.com/download?id={file_id}&export=download&authuser=0&confirm=t'
+    response = session.get(download_url, headers=headers, stream=True, timeout=30)
+    content_type = response.headers.get('Content-Type', '').lower()
+    if 'text/html' in content_type:
+        response.close()
+        # Try alternative URL for large files
+        download_url = f'https://drive.usercontent.google.com/download?id={file_id}&export=download&authuser=0&confirm=t&uuid=123&at=123'
+        response = session.get(download_url, headers=headers, stream=True, timeout=30)
+        content_type = response.headers.get('Content-Type', '').lower()
+        if 'text/html' in content_type:
+            response.close()
+            return None, None, None, "Impossible d'accéder au fichier. Vérifiez les droits de partage."
+    return session, headers, response, None
+
+def download_video_from_drive(video_url, output_path, progress=None, attempts=DOWNLOAD_ATTEMPTS):
+    try:
+        session, headers, response, err = open_drive_download(video_url)
+        if err:
+            return False, err
+        response.close()
+        # Fetch the resolved file URL in parallel slices. A failed attempt leaves its .tmp file and
+        # part list behind, so the next one (or one after a cut streaming download) only fetches
+        # the missing parts
+        delay = 1
+        for attempt in range(attempts):
+            ok, err, _ = download_file(response.url, output_path, session=session, headers=headers, progress=progress)
+            if ok:
+                break
+            if attempt < attempts - 1:
+                print(f"⚠️ Download failed (attempt {attempt + 1}/{attempts}): {err}, resuming in {delay} s")
+                time.sleep(delay)
+                delay *= 2
+        if not ok:
+            return False, f"Erreur pendant le téléchargement: {err}"
+        # Check file
+        if os.path.getsize(output_path) < 10000:
+            os.remove(output_path)
+            return False, "Fichier téléchargé trop petit."
+        # Optionally: check VRO header (not enforced here)
+        return True, None
     except Exception as e:
         if os.path.exists(output_path):
             os.remove(output_path)
         return False, f"Erreur inattendue: {str(e)}"
 
+def is_streamable_container(head_bytes):
+    """Tell from its first bytes whether a video can be demuxed from a pipe.
+
+    MP4/MOV files whose moov atom comes after the media data (common for phone and
+    camera recordings) need seeking, so they are reported as not streamable. Other
+    containers (MKV/WebM, MPEG-TS, AVI...) are assumed to be streamable.
+    """
+    if head_bytes[4:8] != b"ftyp":
+        return True
+    offset = 0
+    while offset + 8 <= len(head_bytes):
+        box_size = int.from_bytes(head_bytes[offset:offset + 4], "big")
+        box_type = head_bytes[offset + 4:offset + 8]
+        if box_type == b"moov":
+            return True
+        if box_type == b"mdat":
+            return False
+        if box_size == 1 and offset + 16 <= len(head_bytes):
+            box_size = int.from_bytes(head_bytes[offset + 8:offset + 16], "big")
+        if box_size < 8:
+            break
+        offset += box_size
+    # No moov atom near the start of an MP4: it is at the end
+    return False
+
 def verify_video_file(file_path):
     """Check if the video file is valid using ffprobe."""
     if not os.path.exists(file_path):
@@ -165,128 +902,519 @@ def verify_video_file(file_path):
         return False, f"Invalid video format: {result.stderr}"
     return True, None
 
-def extract_audio_from_video(input_video_path, output_audio_path):
-    """Extract audio from video using ffmpeg."""
-    if not os.path.exists(input_video_path):
-        return False, "Video file does not exist."
-    if os.path.getsize(input_video_path) == 0:
-        return False, "Video file is empty."
-    # Convert VRO to MP4 if needed (not implemented here)
-    extract_command = [
-        'ffmpeg', '-i', input_video_path, '-vn', '-acodec', 'libmp3lame',
-        '-ar', '44100', '-ab', '192k', '-y', output_audio_path
+# Whisper-ready chunk encodings: 16 kHz mono speech is all the model needs
+WHISPER_CHUNK_FORMATS = {
+    "mp3": (["-c:a", "libmp3lame", "-b:a", "32k"], ".mp3"),
+    "opus": (["-c:a", "libopus", "-b:a", "24k", "-application", "voip"], ".ogg"),
+}
+WHISPER_CHUNK_FORMAT = os.environ.get("WHISPER_CHUNK_FORMAT", "mp3")
+
+def iter_audio_segments(audio_path, segment_length_ms=120000, output_dir=None, chunk_format=None, feed=None):
+    """Split audio with one ffmpeg segment-muxer pass, yielding chunks as they are written.
+
+    By default the audio stream is copied as is. With `chunk_format` (a key of
+    WHISPER_CHUNK_FORMATS) the input, which may be a video, is demuxed, downmixed
+    to 16 kHz mono and encoded straight into small Whisper-ready chunks.
+
+    If `feed` is given, ffmpeg reads its input from stdin instead of `audio_path`
+    (which then only names the chunks) and feed(stdin) is run in a background
+    thread to write it; feed must close stdin when it is done.
+
+    Yields (segment_path, start_sec, duration_sec) tuples in order, using the exact
+    cut points that ffmpeg reports on its live segment list. Raises RuntimeError if
+    ffmpeg fails.
+    """
+    segment_length_sec = segment_length_ms / 1000
+    output_dir = output_dir or os.path.dirname(os.path.abspath(audio_path))
+    base_name, ext = os.path.splitext(os.path.basename(audio_path))
+    if chunk_format:
+        codec_args, ext = WHISPER_CHUNK_FORMATS[chunk_format]
+        codec_args = ["-vn", "-ac", "1", "-ar", "16000"] + codec_args
+    else:
+        codec_args = ["-c", "copy"]
+        ext = ext or ".mp3"
+    # The segment muxer expands printf-style patterns, so escape any '%' in the name
+    output_pattern = os.path.join(output_dir, f"segment_%03d_{base_name.replace('%', '%%')}{ext}")
+    segment_cmd = [
+        "ffmpeg", "-y", "-i", "pipe:0" if feed else audio_path, "-map", "0:a:0", *codec_args,
+        "-f", "segment", "-segment_time", str(segment_length_sec),
+        "-segment_start_number", "1", "-reset_timestamps", "1",
+        "-segment_list", "pipe:1", "-segment_list_type", "csv",
+        output_pattern
     ]
-    result = subprocess.run(extract_command, capture_output=True, text=True)
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(
+            segment_cmd, stdin=subprocess.PIPE if feed else subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=stderr_file
+        )
+        feeder = None
+        if feed:
+            feeder = threading.Thread(target=feed, args=(process.stdin,), daemon=True)
+            feeder.start()
+        completed = False
+        try:
+            # ffmpeg appends a CSV row to the segment list each time it closes a chunk
+            for row in csv.reader(io.TextIOWrapper(process.stdout, encoding="utf-8")):
+                if len(row) < 3:
+                    continue
+                segment_path = os.path.join(output_dir, row[0])
+                start_time, end_time = float(row[1]), float(row[2])
+                if os.path.exists(segment_path):
+                    yield (segment_path, start_time, round(end_time - start_time, 6))
+            completed = True
+        finally:
+            if not completed:
+                # Consumer stopped early: don't leave ffmpeg running in the background
+                process.kill()
+            process.stdout.close()
+            returncode = process.wait()
+            if feeder:
+                feeder.join()
+        if returncode != 0:
+            stderr_file.seek(0)
+            stderr_tail = stderr_file.read().decode(errors="replace")[-500:]
+            raise RuntimeError(f"Audio segmentation error: {stderr_tail}")
+
+# --- Voice Activity Chunking ---
+# Board recordings are full of pauses and dead air before and after the meeting. Measuring
+# frame energy on decoded PCM lets us drop long silences before upload and cut chunks in
+# pauses instead of in the middle of words.
+
+VAD_CHUNKING = os.environ.get("VAD_CHUNKING", "1") != "0"
+VAD_SAMPLE_RATE = 16000
+VAD_FRAME_MS = 30
+VAD_MIN_SILENCE_SEC = float(os.environ.get("VAD_MIN_SILENCE_SEC", "1.0"))  # Shorter pauses are kept
+VAD_PADDING_SEC = float(os.environ.get("VAD_PADDING_SEC", "0.25"))  # Kept on each side of speech
+VAD_MARGIN_DB = float(os.environ.get("VAD_MARGIN_DB", "10"))  # Speech threshold above the noise floor
+VAD_MIN_THRESHOLD_DBFS = -60.0  # Digital silence never counts as speech
+VAD_MAX_THRESHOLD_DBFS = -40.0  # Speech is never silence, even before any pause has been heard
+VAD_MIN_SPEECH_SEC = 0.2  # Isolated clicks and bumps are dropped
+VAD_NOISE_WINDOW_SEC = 600  # Noise floor follows the last 10 minutes of audio
+
+class VoiceActivityChunker:
+    """Incremental energy-based voice activity detector that packs speech into chunks.
+
+    16 kHz mono int16 samples are fed in blocks. A frame is speech when it is louder
+    than the noise floor (10th percentile of recent frame energies) by `margin_db`,
+    with the threshold clamped to [VAD_MIN_THRESHOLD_DBFS, VAD_MAX_THRESHOLD_DBFS].
+    Silences of at least `min_silence_sec` are dropped, keeping `padding_sec` on each
+    side, and the remaining speech is packed into chunks of at most `max_chunk_sec`.
+    Chunks are cut at dropped silences, or at the quietest frame of the second half
+    of the window when a single stretch of speech is longer than a chunk.
+
+    feed() and flush() return the finished chunks as (samples, spans) tuples, where
+    spans lists the (start_sec, end_sec) ranges of the original audio that were
+    concatenated into the chunk.
+    """
+
+    def __init__(self, max_chunk_sec=120.0, min_silence_sec=VAD_MIN_SILENCE_SEC, padding_sec=VAD_PADDING_SEC,
+                 margin_db=VAD_MARGIN_DB, sample_rate=VAD_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.frame = sample_rate * VAD_FRAME_MS // 1000
+        self.max_samples = int(max_chunk_sec * sample_rate)
+        self.min_silence = int(min_silence_sec * sample_rate)
+        self.min_speech = int(VAD_MIN_SPEECH_SEC * sample_rate)
+        self.padding = min(int(padding_sec * sample_rate), self.min_silence // 2)
+        self.margin_db = margin_db
+        self.noise_window = VAD_NOISE_WINDOW_SEC * 1000 // VAD_FRAME_MS
+        self.total_samples = 0
+        self.kept_samples = 0
+        # Samples (and per-frame energies) still needed, starting at absolute sample _buffer_start
+        self._buffer = np.zeros(0, dtype=np.int16)
+        self._buffer_start = 0
+        self._energies = np.zeros(0, dtype=np.float32)
+        self._history = np.zeros(0, dtype=np.float32)
+        self._frames_done = 0
+        # Stretch of speech being read: padded start, first and last speech samples
+        self._open_start = None
+        self._speech_start = 0
+        self._speech_end = 0
+        self._prev_end = 0
+        # Chunk being packed
+        self._chunk_parts = []
+        self._chunk_spans = []
+        self._chunk_length = 0
+
+    def feed(self, samples):
+        """Add PCM samples and return the chunks they complete."""
+        finished = []
+        self._buffer = np.concatenate([self._buffer, samples])
+        self.total_samples += len(samples)
+        frame = self.frame
+        first = self._frames_done * frame - self._buffer_start
+        count = (len(self._buffer) - first) // frame
+        if count <= 0:
+            return finished
+        frames = self._buffer[first:first + count * frame].reshape(count, frame).astype(np.float32) / 32768
+        energies = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        self._energies = np.concatenate([self._energies, energies])
+        self._history = np.concatenate([self._history, energies])[-self.noise_window:]
+        noise_floor = float(np.percentile(self._history, 10))
+        threshold = min(max(noise_floor + self.margin_db, VAD_MIN_THRESHOLD_DBFS), VAD_MAX_THRESHOLD_DBFS)
+
+        for is_speech in energies > threshold:
+            start = self._frames_done * frame
+            end = start + frame
+            self._frames_done += 1
+            if is_speech:
+                if self._open_start is None:
+                    self._open_start = max(start - self.padding, self._prev_end, self._buffer_start)
+                    self._speech_start = start
+                self._speech_end = end
+            elif self._open_start is not None and end - self._speech_end >= self.min_silence:
+                self._close_speech(end)
+            if self._open_start is not None:
+                open_length = min(end, self._speech_end + self.padding) - self._open_start
+                if self._chunk_length + open_length > self.max_samples:
+                    self._split(finished)
+        self._trim()
+        return finished
+
+    def flush(self):
+        """Close the stream and return the remaining chunks."""
+        finished = []
+        if self._open_start is not None:
+            self._close_speech(self._frames_done * self.frame)
+        if self._chunk_spans:
+            finished.append(self._finish_chunk())
+        return finished
+
+    def _samples(self, start, end):
+        return self._buffer[start - self._buffer_start:end - self._buffer_start]
+
+    def _add_span(self, start, end):
+        self._chunk_parts.append(self._samples(start, end).copy())
+        self._chunk_spans.append((start, end))
+        self._chunk_length += end - start
+        self.kept_samples += end - start
+        self._prev_end = end
+
+    def _close_speech(self, limit):
+        start = self._open_start
+        self._open_start = None
+        if self._speech_end - self._speech_start < self.min_speech:
+            return
+        self._add_span(start, min(self._speech_end + self.padding, limit))
+
+    def _split(self, finished):
+        if self._chunk_spans:
+            # The chunk is full: end it at the silence before the current stretch of speech
+            finished.append(self._finish_chunk())
+            return
+        # A single stretch of speech is longer than a chunk: cut it at its quietest frame
+        first = -(-(self._open_start + self.max_samples // 2) // self.frame)
+        last = max(first + 1, (self._open_start + self.max_samples) // self.frame)
+        offset = self._buffer_start // self.frame
+        window = self._energies[first - offset:last - offset]
+        cut = (first + int(np.argmin(window))) * self.frame if len(window) else self._open_start + self.max_samples
+        self._add_span(self._open_start, cut)
+        finished.append(self._finish_chunk())
+        self._open_start = cut
+
+    def _finish_chunk(self):
+        samples = np.concatenate(self._chunk_parts)
+        spans = [(start / self.sample_rate, end / self.sample_rate) for start, end in self._chunk_spans]
+        self._chunk_parts = []
+        self._chunk_spans = []
+        self._chunk_length = 0
+        return samples, spans
+
+    def _trim(self):
+        # Keep the open stretch of speech, or enough audio to pad the next one
+        keep_from = self._open_start if self._open_start is not None else self._frames_done * self.frame - self.padding
+        keep_from = max(self._buffer_start, keep_from // self.frame * self.frame)
+        drop = keep_from - self._buffer_start
+        if drop > 0:
+            self._buffer = self._buffer[drop:]
+            self._energies = self._energies[drop // self.frame:]
+            self._buffer_start = keep_from
+
+def encode_pcm_chunk(samples, output_path, chunk_format):
+    """Encode 16 kHz mono int16 samples into a Whisper-ready file with ffmpeg."""
+    codec_args, _ = WHISPER_CHUNK_FORMATS[chunk_format]
+    encode_cmd = [
+        "ffmpeg", "-y", "-f", "s16le", "-ar", str(VAD_SAMPLE_RATE), "-ac", "1", "-i", "pipe:0",
+        *codec_args, output_path
+    ]
+    result = subprocess.run(encode_cmd, input=samples.astype("<i2").tobytes(), stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE)
     if result.returncode != 0:
-        return False, f"Audio extraction error: {result.stderr}"
-    if not os.path.exists(output_audio_path) or os.path.getsize(output_audio_path) == 0:
-        return False, "Audio file not created or is empty."
-    return True, None
+        raise RuntimeError(f"Chunk encoding error: {result.stderr.decode(errors='replace')[-500:]}")
+
+def iter_speech_segments(audio_path, max_chunk_ms=120000, output_dir=None, chunk_format=None, feed=None):
+    """Decode audio to PCM, drop long silences and yield chunks cut in pauses.
+
+    Works like iter_audio_segments (including `feed`), but chunk boundaries come from
+    VoiceActivityChunker instead of fixed windows, and chunks are always encoded with
+    `chunk_format` (WHISPER_CHUNK_FORMAT by default).
+
+    Yields (segment_path, start_sec, duration_sec, spans) tuples in order: start_sec
+    is where the chunk begins in the original audio, duration_sec is the length of
+    the chunk itself and spans lists the original (start_sec, end_sec) ranges it
+    contains. Raises RuntimeError if ffmpeg fails.
+    """
+    output_dir = output_dir or os.path.dirname(os.path.abspath(audio_path))
+    base_name = os.path.splitext(os.path.basename(audio_path))[0]
+    chunk_format = chunk_format or WHISPER_CHUNK_FORMAT
+    ext = WHISPER_CHUNK_FORMATS[chunk_format][1]
+    chunker = VoiceActivityChunker(max_chunk_sec=max_chunk_ms / 1000)
+    decode_cmd = [
+        "ffmpeg", "-i", "pipe:0" if feed else audio_path, "-map", "0:a:0", "-vn",
+        "-ac", "1", "-ar", str(VAD_SAMPLE_RATE), "-f", "s16le", "pipe:1"
+    ]
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(
+            decode_cmd, stdin=subprocess.PIPE if feed else subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=stderr_file
+        )
+        feeder = None
+        if feed:
+            feeder = threading.Thread(target=feed, args=(process.stdin,), daemon=True)
+            feeder.start()
+        completed = False
+        index = 0
+
+        def write_chunk(samples, spans):
+            nonlocal index
+            index += 1
+            segment_path = os.path.join(output_dir, f"speech_{index:03d}_{base_name}{ext}")
+            encode_pcm_chunk(samples, segment_path, chunk_format)
+            return (segment_path, spans[0][0], round(len(samples) / VAD_SAMPLE_RATE, 6), spans)
 
-def segment_audio(audio_path, segment_length_ms=120000):
-    """Split audio into segments using ffmpeg."""
-    try:
-        result = subprocess.run([
-            'ffprobe', '-v', 'error', '-show_entries',
-            'format=duration', '-of',
-            'default=noprint_wrappers=1:nokey=1', audio_path
-        ], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-        total_duration = float(result.stdout)
-        segment_length_sec = segment_length_ms / 1000
-        num_segments = math.ceil(total_duration / segment_length_sec)
-        segment_paths = []
-        temp_dir = tempfile.gettempdir()
-        for i in range(num_segments):
-            start_time = i * segment_length_sec
-            temp_segment_path = os.path.join(temp_dir, f"segment_{i+1}_{os.path.basename(audio_path)}.mp3")
-            extract_cmd = [
-                "ffmpeg", "-y", "-i", audio_path, "-ss", str(start_time),
-                "-t", str(segment_length_sec), "-c", "copy", temp_segment_path
-            ]
-            subprocess.run(extract_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
-            if os.path.exists(temp_segment_path):
-                segment_paths.append(temp_segment_path)
-        return segment_paths
-    except Exception as e:
-        return []
+        try:
+            pending = b""
+            while True:
+                block = process.stdout.read(VAD_SAMPLE_RATE * 2)  # One second of 16-bit samples
+                if not block:
+                    break
+                pending += block
+                usable = len(pending) // 2 * 2
+                samples = np.frombuffer(pending[:usable], dtype="<i2")
+                pending = pending[usable:]
+                for chunk_samples, spans in chunker.feed(samples):
+                    yield write_chunk(chunk_samples, spans)
+            if process.wait() == 0:
+                for chunk_samples, spans in chunker.flush():
+                    yield write_chunk(chunk_samples, spans)
+            completed = True
+        finally:
+            if not completed:
+                # Consumer stopped early: don't leave ffmpeg running in the background
+                process.kill()
+            process.stdout.close()
+            returncode = process.wait()
+            if feeder:
+                feeder.join()
+        if returncode != 0:
+            stderr_file.seek(0)
+            stderr_tail = stderr_file.read().decode(errors="replace")[-500:]
+            raise RuntimeError(f"Audio decoding error: {stderr_tail}")
+    total_sec = chunker.total_samples / VAD_SAMPLE_RATE
+    dropped_sec = total_sec - chunker.kept_samples / VAD_SAMPLE_RATE
+    print(f"🔇 Dropped {dropped_sec:.0f} s of silence out of {total_sec:.0f} s ({index} speech chunk(s))")
+
+def iter_transcription_chunks(audio_path, segment_length_ms=120000, output_dir=None, chunk_format=None, feed=None):
+    """Chunk audio for Whisper: cut in pauses with silence removed, or in fixed windows with VAD_CHUNKING=0."""
+    if VAD_CHUNKING:
+        return iter_speech_segments(audio_path, segment_length_ms, output_dir, chunk_format, feed)
+    return iter_audio_segments(audio_path, segment_length_ms, output_dir, chunk_format, feed)
+
+# --- Transcription Manifests ---
+# Every transcription run is recorded chunk by chunk and the audio of failed chunks is kept,
+# so recovering from a partial provider outage only re-sends those chunks.
+
+TRANSCRIPTION_RUNS_DIR = os.environ.get(
+    "PV_TRANSCRIPTION_RUNS_DIR", os.path.join(tempfile.gettempdir(), "pv_transcriptions")
+)
+TRANSCRIPTION_RUN_TTL = float(os.environ.get("TRANSCRIPTION_RUN_TTL_DAYS", "7")) * 86400
+SEGMENT_ERROR_PATTERN = re.compile(r"\[Segment \d+ (error|failed|unexpected error)")
+
+def is_failed_segment(text):
+    """Tell whether a transcript segment is one of the error placeholders of transcribe_audio_stream."""
+    return bool(SEGMENT_ERROR_PATTERN.match(text))
+
+class TranscriptionManifest:
+    """Chunk-by-chunk record of a transcription run, persisted as JSON.
+
+    Each chunk entry holds its ID, the SHA-256 of its audio, its offsets in the
+    original recording, its status ("done" or "failed") and its text. The audio of
+    failed chunks is moved next to the manifest so retry_failed_chunks can re-send it.
+    """
+
+    def __init__(self, source=None, run_id=None, session_id=None):
+        self.run_id = run_id or uuid.uuid4().hex
+        self.directory = os.path.join(TRANSCRIPTION_RUNS_DIR, self.run_id)
+        self.source = source
+        # PV session whose transcript a retry of this run repairs, if any
+        self.session_id = session_id
+        self.created_at = time.time()
+        self.complete = False
+        self.chunks = []
+
+    @classmethod
+    def load(cls, run_id):
+        """Load a saved manifest, or return None if there is none with this ID."""
+        if not re.fullmatch(r"[0-9a-f]{32}", run_id):
+            return None
+        manifest = cls(run_id=run_id)
+        try:
+            with open(os.path.join(manifest.directory, "manifest.json"), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        manifest.source = data["source"]
+        manifest.session_id = data.get("session_id")
+        manifest.created_at = data["created_at"]
+        manifest.complete = data["complete"]
+        manifest.chunks = data["chunks"]
+        return manifest
+
+    def reset(self):
+        """Forget the chunks recorded so far, before a run starts over."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.chunks = []
+        self.complete = False
+
+    def record(self, index, segment, text, digest=None):
+        """Record the result of chunk `index`, keeping its audio if it failed."""
+        if isinstance(segment, tuple):
+            segment_path = segment[0]
+            start_sec, duration_sec, end_sec = segment[1], segment[2], segment_end(segment)
+        else:
+            segment_path, start_sec, duration_sec, end_sec = segment, None, None, None
+        failed = is_failed_segment(text)
+        chunk = {
+            "id": index,
+            "hash": digest,
+            "start_sec": start_sec,
+            "end_sec": end_sec,
+            "duration_sec": duration_sec,
+            "spans": segment[3] if isinstance(segment, tuple) and len(segment) > 3 else None,
+            "status": "failed" if failed else "done",
+            "text": text,
+            "audio_path": None,
+        }
+        if failed and os.path.exists(segment_path):
+            os.makedirs(self.directory, exist_ok=True)
+            ext = os.path.splitext(segment_path)[1]
+            chunk["audio_path"] = shutil.move(segment_path, os.path.join(self.directory, f"chunk_{index:04d}{ext}"))
+        self.chunks.append(chunk)
+
+    def failed_chunks(self):
+        return [chunk for chunk in self.chunks if chunk["status"] == "failed"]
+
+    def transcript_segments(self):
+        return [chunk["text"] for chunk in sorted(self.chunks, key=lambda chunk: chunk["id"])]
+
+    def to_dict(self):
+        return {
+            "transcription_id": self.run_id,
+            "source": self.source,
+            "session_id": self.session_id,
+            "created_at": self.created_at,
+            "complete": self.complete,
+            "chunks": self.chunks,
+        }
 
-def transcribe_audio_segments(segments, batch_size=8, timeout=30):
-    """Transcribe audio segments using OpenAI's Whisper API with parallel processing."""
-    full_transcript = []
-    failed_segments = []
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, "manifest.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+def prune_transcription_runs():
+    """Delete the manifests (and kept chunks) of runs older than TRANSCRIPTION_RUN_TTL."""
+    if not os.path.isdir(TRANSCRIPTION_RUNS_DIR):
+        return
+    cutoff = time.time() - TRANSCRIPTION_RUN_TTL
+    for entry in os.scandir(TRANSCRIPTION_RUNS_DIR):
+        if entry.is_dir() and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+def transcribe_audio_stream(segments, max_workers=6, timeout=30, priority=PRIORITY_INTERACTIVE, manifest=None):
+    """Transcribe audio segments with Whisper as they arrive, yielding results in order.
+
+    `segments` may be any iterable (including a live generator such as
+    iter_audio_segments) of segment paths or tuples starting with
+    (segment_path, start_sec, duration_sec). Each segment is submitted to the
+    worker pool as soon as it is produced, and (index, segment, text) tuples are
+    yielded in segment order. API calls are admitted by the process-wide
+    whisper_scheduler at the given priority. Each result is recorded in
+    `manifest`, if given.
+    """
     active_threads = 0
     max_active_threads = 0
+    digests = {}
     
-    # Initialize OpenAI client with explicit API key check
-    if not openai_api_key or not openai_api_key.startswith("sk-"):
-        raise ValueError("Invalid OpenAI API key. Key should start with 'sk-'")
-    
-    client = openai.OpenAI(api_key=openai_api_key)
-    print("✅ OpenAI client initialized successfully")
-    
-    # Semaphore to limit concurrent API calls
-    api_semaphore = threading.Semaphore(5)  # Allow 5 concurrent API calls
+    # Shared client (raises ValueError if the API key is invalid)
+    client = get_openai_client()
     
     def process_segment(segment_info):
         nonlocal active_threads, max_active_threads
-        i, segment_path = segment_info
+        i, segment_path, audio_seconds = segment_info
         max_retries = 5
-        initial_retry_delay = 5
-        retry_delay = initial_retry_delay
         
         active_threads += 1
         max_active_threads = max(max_active_threads, active_threads)
         print(f"🔄 Starting segment {i+1} (Active threads: {active_threads})")
         
         try:
+            with open(segment_path, "rb") as audio_file:
+                audio_bytes = audio_file.read()
+            print(f"📊 Segment {i+1} size: {len(audio_bytes)} bytes")
+            digests[i] = hashlib.sha256(audio_bytes).hexdigest()
+
+            cache_key = DiskCache.make_key(audio_bytes, WHISPER_MODEL, WHISPER_LANGUAGE, WHISPER_RESPONSE_FORMAT)
+            cached_text = transcript_cache.get(cache_key)
+            if cached_text is not None:
+                print(f"💾 Segment {i+1} served from transcript cache")
+                os.remove(segment_path)
+                return (i, cached_text)
+
             for attempt in range(max_retries):
                 try:
-                    with open(segment_path, "rb") as audio_file:
-                        print(f"📊 Segment {i+1} size: {os.path.getsize(segment_path)} bytes")
-                        
-                        with api_semaphore:
-                            print(f"🎯 Attempting transcription for segment {i+1} (attempt {attempt + 1}/{max_retries})...")
-                            
-                            # Use the pre-initialized client
-                            response = client.audio.transcriptions.create(
-                                model="whisper-1",
-                                file=audio_file,
-                                language="fr",
-                                response_format="text"
-                            )
+                    whisper_scheduler.acquire(audio_seconds, priority)
+                    print(f"🎯 Attempting transcription for segment {i+1} (attempt {attempt + 1}/{max_retries})...")
+                    try:
+                        # Use the pre-initialized client
+                        raw_response = client.audio.transcriptions.with_raw_response.create(
+                            model=WHISPER_MODEL,
+                            file=(os.path.basename(segment_path), audio_bytes),
+                            language=WHISPER_LANGUAGE,
+                            response_format=WHISPER_RESPONSE_FORMAT
+                        )
+                    except openai.RateLimitError as e:
+                        whisper_scheduler.release("rate_limited", e.response.headers)
+                        raise
+                    except Exception:
+                        whisper_scheduler.release("error")
+                        raise
+                    whisper_scheduler.release("success", raw_response.headers)
+                    response = raw_response.parse()
                     
                     if response:
                         print(f"✅ Successfully transcribed segment {i+1}")
+                        transcript_cache.set(cache_key, response)
                         os.remove(segment_path)
                         return (i, response)
                     else:
                         print(f"⚠️ Segment {i+1} returned no text from Whisper (attempt {attempt + 1})")
                         
+                except openai.RateLimitError as e:
+                    error_msg = str(e)
+                    if "insufficient_quota" in error_msg.lower() or "quota_exceeded" in error_msg.lower():
+                        # Waiting does not restore a billing quota
+                        print(f"⚠️ Quota exceeded for segment {i+1}: {error_msg}")
+                        return (i, f"[Segment {i+1} error after {attempt + 1} attempts: {error_msg}]")
+                    # The scheduler has already paused admissions per the provider's reset hints
+                    print(f"⏳ Rate limit hit for segment {i+1} (attempt {attempt + 1}), requeueing...")
+                    continue
+                    
                 except Exception as e:
                     error_msg = str(e)
                     print(f"❌ Error transcribing segment {i+1} (attempt {attempt + 1}): {error_msg}")
                     
-                    if "rate_limit_exceeded" in error_msg.lower():
-                        try:
-                            import re
-                            retry_after = re.search(r'retry after (\d+)', error_msg.lower())
-                            if retry_after:
-                                retry_delay = int(retry_after.group(1))
-                            else:
-                                retry_delay = min(120, retry_delay * 1.5)
-                                retry_delay += random.uniform(0, 0.5) * retry_delay
-                        except:
-                            retry_delay = min(120, retry_delay * 1.5)
-                            
-                        print(f"⏳ Rate limit hit, waiting {retry_delay:.2f} seconds before retry...")
-                        time.sleep(retry_delay)
-                        continue
-                        
-                    if "quota_exceeded" in error_msg.lower():
-                        print(f"⚠️ Quota exceeded for segment {i+1}, waiting longer...")
-                        time.sleep(180)
-                        continue
-                        
                     if attempt == max_retries - 1:
                         return (i, f"[Segment {i+1} error after {max_retries} attempts: {error_msg}]")
                     
@@ -298,48 +1426,234 @@ def transcribe_audio_segments(segments, batch_size=8, timeout=30):
             active_threads -= 1
             print(f"🏁 Finished segment {i+1} (Active threads: {active_threads})")
 
-    # Create a single ThreadPoolExecutor for all segments
-    max_workers = min(6, len(segments))  # Maximum of 6 concurrent workers
+    def segment_result(i):
+        segment, future = pending.pop(i)
+        try:
+            text = future.result()[1]
+        except Exception as e:
+            print(f"💥 Unexpected error processing segment: {str(e)}")
+            text = f"[Segment {i+1} unexpected error: {str(e)}]"
+        if manifest is not None:
+            manifest.record(i, segment, text, digests.get(i))
+        return (i, segment, text)
+
     print(f"\n🚀 Starting transcription with {max_workers} concurrent workers")
     
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all segments for processing
-        future_to_segment = {
-            executor.submit(process_segment, (i, segment)): (i, segment)
-            for i, segment in enumerate(segments)
-        }
+        pending = {}
+        next_index = 0
+        # Submit each segment as soon as the producer emits it
+        for i, segment in enumerate(segments):
+            if isinstance(segment, tuple):
+                segment_path, audio_seconds = segment[0], segment[2]
+            else:
+                # Plain paths carry no duration: assume a full-length chunk for rate limiting
+                segment_path, audio_seconds = segment, 120.0
+            pending[i] = (segment, executor.submit(process_segment, (i, segment_path, audio_seconds)))
+            # Hand back any results that are ready, without waiting on the producer
+            while next_index in pending and pending[next_index][1].done():
+                yield segment_result(next_index)
+                next_index += 1
         
-        # Process results as they complete
-        results = []
-        for future in concurrent.futures.as_completed(future_to_segment):
-            try:
-                result = future.result()
-                results.append(result)
-                
-                if result[1].startswith("[Segment") and "error" in result[1]:
-                    failed_segments.append(result[0] + 1)
-                    
-            except Exception as e:
-                print(f"💥 Unexpected error processing segment: {str(e)}")
-                segment_info = future_to_segment[future]
-                results.append((segment_info[0], f"[Segment {segment_info[0]+1} unexpected error: {str(e)}]"))
-                failed_segments.append(segment_info[0] + 1)
-    
-    # Sort results by segment index and create final transcript
-    results.sort(key=lambda x: x[0])
-    full_transcript = [text for _, text in results]
+        # Producer exhausted: drain the remaining results in order
+        while next_index in pending:
+            yield segment_result(next_index)
+            next_index += 1
     
     print(f"\n📊 Parallel Processing Statistics:")
     print(f"Maximum concurrent threads: {max_active_threads}")
-    
-    if failed_segments:
-        print("\n⚠️ Warning: Some segments failed to transcribe:")
-        print(f"Failed segments: {sorted(failed_segments)}")
-        print("Consider retrying these segments manually or with a different API key")
-    else:
-        print("\n✅ All segments transcribed successfully!")
-    
-    return full_transcript
+
+def retry_failed_chunks(manifest, priority=PRIORITY_INTERACTIVE):
+    """Re-transcribe the failed chunks of a saved run and splice their text into the manifest.
+
+    Returns the number of chunks that were retried.
+    """
+    retryable = [chunk for chunk in manifest.failed_chunks() if chunk["audio_path"] and os.path.exists(chunk["audio_path"])]
+    segments = [
+        (chunk["audio_path"], chunk["start_sec"] or 0.0, chunk["duration_sec"] or 120.0) for chunk in retryable
+    ]
+    print(f"🔁 Retrying {len(segments)} failed chunk(s) of transcription {manifest.run_id}")
+    for j, _, text in transcribe_audio_stream(segments, max_workers=max(1, min(6, len(segments))), priority=priority):
+        chunk = retryable[j]
+        chunk["text"] = text
+        if not is_failed_segment(text):
+            # transcribe_audio_stream deletes the audio of chunks that went through
+            chunk["status"] = "done"
+            chunk["audio_path"] = None
+    manifest.save()
+    return len(segments)
+
+def transcribe_audio_file(audio_path, segment_length_ms=120000, chunk_format=None, priority=PRIORITY_INTERACTIVE,
+                          output_dir=None, feed=None, events=None, manifest=None):
+    """Segment and transcribe an audio (or, with `chunk_format`, video) file as a pipeline.
+
+    Chunks are handed to the Whisper workers as soon as ffmpeg writes them, so
+    segmentation overlaps with transcription. With VAD_CHUNKING (the default), long
+    silences are dropped and chunks are cut in pauses. `output_dir` and `feed` are
+    passed on to the chunker.
+
+    `events`, if given, is called as events(event, data) with "progress" events for
+    extraction and segmentation and a "segment" event for each transcript segment,
+    in order.
+
+    Every chunk is recorded in `manifest` (a new TranscriptionManifest by default),
+    which is saved when the run ends. Returns the ordered transcript segments, or
+    an empty list if segmentation failed.
+    """
+    manifest = manifest or TranscriptionManifest(source=os.path.basename(audio_path))
+    def emit(event, **data):
+        if events:
+            events(event, data)
+
+    def reported(segment_stream):
+        emit("progress", stage="extraction")
+        for count, segment in enumerate(segment_stream, 1):
+            emit("progress", stage="segmentation", chunks=count, position_sec=round(segment_end(segment), 3))
+            yield segment
+
+    try:
+        segment_stream = iter_transcription_chunks(audio_path, segment_length_ms, output_dir, chunk_format, feed)
+        transcript_segments = []
+        for i, segment, text in transcribe_audio_stream(reported(segment_stream), priority=priority, manifest=manifest):
+            transcript_segments.append(text)
+            emit("segment", index=i, start_sec=round(segment[1], 3), end_sec=round(segment_end(segment), 3), text=text)
+        manifest.complete = True
+        failed_chunks = manifest.failed_chunks()
+        if failed_chunks:
+            print(f"⚠️ {len(failed_chunks)} chunk(s) failed, retry them with POST /transcriptions/{manifest.run_id}/retry")
+        return transcript_segments
+    except RuntimeError as e:
+        print(f"❌ {str(e)}")
+        return []
+    finally:
+        manifest.save()
+
+def segment_end(segment):
+    """End of a chunk yielded by iter_transcription_chunks, in seconds of the original audio."""
+    if len(segment) > 3:
+        return segment[3][-1][1]
+    return segment[1] + segment[2]
+
+DRIVE_STREAMING = os.environ.get("DRIVE_STREAMING", "1") != "0"
+
+def transcribe_drive_video(google_drive_url, temp_dir, segment_length_ms=120000, priority=PRIORITY_INTERACTIVE,
+                           events=None, manifest=None):
+    """Transcribe a Google Drive video, starting extraction while the bytes are still arriving.
+
+    The download is written to a growing file and piped into ffmpeg at the same time,
+    so Whisper-ready chunks are emitted and transcribed during the download. Videos
+    that need seeking (MP4 with the moov atom at the end) are detected from their
+    first bytes and downloaded in full first; if ffmpeg still fails on the pipe, the
+    completed file is processed the usual way.
+
+    `events` receives "download" progress events on top of those sent by
+    transcribe_audio_file. If a fallback starts over, a "restart" progress event is
+    sent and the segments are sent again from index 0. The run is recorded in
+    `manifest` (a new TranscriptionManifest by default).
+
+    Returns (transcript_segments, err).
+    """
+    video_path = os.path.join(temp_dir, "downloaded_video.mp4")
+    manifest = manifest or TranscriptionManifest(source=google_drive_url)
+
+    def emit(event, **data):
+        if events:
+            events(event, data)
+
+    def report_download(downloaded, total, bytes_per_sec=None):
+        emit("progress", stage="download", bytes=downloaded, total_bytes=total)
+
+    def transcribe_downloaded_file(download=True):
+        if download:
+            ok, err = download_video_from_drive(google_drive_url, video_path, progress=report_download)
+            if not ok:
+                return [], f"Erreur de téléchargement Google Drive: {err}"
+            print(f"Downloaded video to: {video_path}") # Debug print
+        valid, err = verify_video_file(video_path)
+        if not valid:
+            return [], f"Erreur de vérification vidéo: {err}"
+        transcript_segments = transcribe_audio_file(
+            video_path, segment_length_ms, chunk_format=WHISPER_CHUNK_FORMAT, priority=priority, events=events,
+            manifest=manifest
+        )
+        if not transcript_segments:
+            return [], "Erreur d'extraction audio vidéo"
+        return transcript_segments, None
+
+    if not DRIVE_STREAMING:
+        return transcribe_downloaded_file()
+
+    _, _, response, err = open_drive_download(google_drive_url)
+    if err:
+        return [], f"Erreur de téléchargement Google Drive: {err}"
+    body = response.iter_content(chunk_size=DOWNLOAD_BUFFER_SIZE)
+    head = b""
+    for chunk in body:
+        head += chunk
+        if len(head) >= DOWNLOAD_BUFFER_SIZE:
+            break
+    if not is_streamable_container(head):
+        print("⚠️ Video needs seeking (moov atom at the end), downloading the whole file first")
+        response.close()
+        return transcribe_downloaded_file()
+
+    download_state = {"bytes": 0, "error": None}
+    total_bytes = int(response.headers.get("Content-Length", 0)) or None
+
+    def feed(ffmpeg_stdin):
+        # The stream is written to the .tmp file download_file resumes from, and only
+        # renamed to video_path once complete
+        temp_path = video_path + ".tmp"
+        piping = True
+        try:
+            with open(temp_path, "wb") as f:
+                for chunk in itertools.chain([head], body):
+                    if not chunk:
+                        continue
+                    f.write(chunk)
+                    download_state["bytes"] += len(chunk)
+                    report_download(download_state["bytes"], total_bytes)
+                    if piping:
+                        try:
+                            ffmpeg_stdin.write(chunk)
+                        except (BrokenPipeError, OSError, ValueError):
+                            # ffmpeg gave up on the pipe: keep downloading for the fallback
+                            piping = False
+            os.replace(temp_path, video_path)
+        except StreamClosed:
+            pass  # The client went away: stop downloading
+        except Exception as e:
+            download_state["error"] = str(e)
+            keep_partial_download(video_path, download_state["bytes"], total_bytes)
+        finally:
+            try:
+                ffmpeg_stdin.close()
+            except OSError:
+                pass
+            response.close()
+
+    print("Streaming Drive download into ffmpeg...") # Debug print
+    # transcribe_audio_file reports chunker errors by returning no segments
+    transcript_segments = transcribe_audio_file(
+        video_path, segment_length_ms, chunk_format=WHISPER_CHUNK_FORMAT, priority=priority,
+        output_dir=temp_dir, feed=feed, events=events, manifest=manifest
+    )
+
+    if download_state["error"]:
+        # The stream was cut short: finish with the parallel downloader, from the bytes already received
+        print(f"⚠️ Streaming download failed ({download_state['error']}), resuming with range requests")
+        emit("progress", stage="restart")
+        manifest.reset()
+        return transcribe_downloaded_file()
+    if transcript_segments:
+        print(f"Downloaded video to: {video_path} ({download_state['bytes']} bytes)") # Debug print
+        return transcript_segments, None
+    if download_state["bytes"] < 10000:
+        return [], "Erreur de téléchargement Google Drive: Fichier téléchargé trop petit."
+    print("⚠️ Streaming extraction failed, falling back to the downloaded file")
+    emit("progress", stage="restart")
+    manifest.reset()
+    return transcribe_downloaded_file(download=False)
 
 def retry_with_backoff(func, max_retries=5, initial_delay=1):
     """Fonction utilitaire pour réessayer une opération avec un délai exponentiel"""
@@ -365,8 +1679,85 @@ def retry_with_backoff(func, max_retries=5, initial_delay=1):
     
     return wrapper
 
-def create_word_pv_document(pv_text: str, meeting_info: dict) -> io.BytesIO:
-    """Creates a Word document from PV text and meeting information."""
+# Section titles of the generated PV, in matching order (a line starting with a title opens that section)
+PV_SECTION_TITLES = (
+    "PROCES VERBAL DE LA RÉUNION",
+    "SONT PRESENTS OU REPRESENTES :",
+    "Est Absent Excusé :",
+    "Assistent également à la réunion :",
+    "ORDRE DU JOUR:",
+    "DÉROULÉ ET DÉCISIONS",
+    "CONCLUSION",
+    "ACRONYMES",
+)
+PV_SECTION_TITLE_PATTERN = re.compile("|".join(re.escape(title) for title in PV_SECTION_TITLES))
+
+# Participant sections only count as filled when they list at least one "- name" line
+PV_PARTICIPANT_SECTIONS = frozenset({
+    "SONT PRESENTS OU REPRESENTES :",
+    "Est Absent Excusé :",
+    "Assistent également à la réunion :",
+})
+
+# Fallback phrases Gemini writes for empty sections, dropped when they appear as a full line
+PV_EXCLUDED_LINES = frozenset({
+    "Le PV a été validé moyennant les corrections à apporter.",
+    "Aucune conclusion formelle enregistrée.",
+    "Aucun acronyme n'a été trouvé dans les documents fournis.",
+})
+
+def parse_pv_sections(pv_text):
+    """Parse the generated PV text into sections in a single pass.
+
+    Returns (preamble_lines, sections): the non-empty lines before the first section
+    title, and one {"title", "lines", "has_content"} dict per section in text order.
+    `lines` holds the section's stripped, non-empty lines minus PV_EXCLUDED_LINES;
+    `has_content` tells whether the section is worth adding to the document.
+    """
+    preamble_lines = []
+    sections = []
+    current = None
+    for line in pv_text.strip().split('\n'):
+        stripped_line = line.strip()
+        title_match = PV_SECTION_TITLE_PATTERN.match(stripped_line)
+        if title_match:
+            # The rest of a title line is not kept, the section starts on the next line
+            title = title_match.group(0)
+            current = {
+                "title": title,
+                "lines": [],
+                "has_content": False,
+                "participants": title in PV_PARTICIPANT_SECTIONS,
+            }
+            sections.append(current)
+        elif not stripped_line:
+            continue
+        elif current is None:
+            preamble_lines.append(stripped_line)
+        else:
+            if not current["has_content"]:
+                if current["participants"]:
+                    current["has_content"] = stripped_line.startswith('-') and len(stripped_line) > 1
+                else:
+                    current["has_content"] = not stripped_line.startswith(('-', '*'))
+            if stripped_line not in PV_EXCLUDED_LINES:
+                current["lines"].append(stripped_line)
+    for pv_section in sections:
+        del pv_section["participants"]
+    return preamble_lines, sections
+
+# The fixed parts of every PV (TMPA header table and borders, closing paragraphs, signature
+# blocks, footer with its PAGE/NUMPAGES fields) are built once into an in-memory template.
+# Each document starts as a copy of it: only the document and footer parts are copied, the
+# parts no PV changes (styles, numbering, theme...) are shared, and nothing is re-parsed.
+
+PV_FOOTER_PREFIX = "PV_CA_TMPA_"
+
+pv_document_template = None
+pv_document_template_lock = threading.Lock()
+
+def build_pv_document_template():
+    """Builds the fixed parts of the PV: header table, closing text, signatures and footer."""
     doc = Document()
 
     # Get the first section
@@ -408,120 +1799,6 @@ RC N°45349 TANGER – ICE : 000053443000022"""
     # Add some space after the header table
     doc.add_paragraph()
 
-    # === Ajout du reste du texte généré par Gemini au corps du document ===
-    # Parse the generated text to conditionally add sections based on content
-    body_text = pv_text.strip()
-    lines = body_text.split('\n')
-
-    section_titles = [
-        "PROCES VERBAL DE LA RÉUNION", # Special case: first major block
-        "SONT PRESENTS OU REPRESENTES :",
-        "Est Absent Excusé :",
-        "Assistent également à la réunion :",
-        "ORDRE DU JOUR:",
-        "DÉROULÉ ET DÉCISIONS",
-        "CONCLUSION",
-        "ACRONYMES"
-    ]
-
-    # Function to check if a list of lines contains meaningful content
-    def has_meaningful_content(lines_to_check, is_participant_list=False):
-        if is_participant_list:
-             # For participant lists, check specifically for bullet points with text
-             return any(line.strip().startswith('-') and len(line.strip()) > 1 for line in lines_to_check)
-        else:
-             # For other sections, check for any non-empty line that isn't just a bullet point or asterisk
-             return any(line.strip() and not line.strip().startswith('-') and not line.strip().startswith('*') for line in lines_to_check)
-
-    # Function to add a section (title + content) to the document if it has content
-    def add_section_to_doc(title, content_lines):
-        is_participant_list = title in ["SONT PRESENTS OU REPRESENTES :", "Est Absent Excusé :", "Assistent également à la réunion :"]
-
-        # Always include the main PV header section if it's the first major block
-        if title == "PROCES VERBAL DE LA RÉUNION  DU CONSEIL D'ADMINISTRATION ":
-             # Add the lines of the main PV header block with specific formatting for the first three lines
-             for i, line in enumerate(content_lines):
-                 stripped_line = line.strip()
-                 if stripped_line:
-                     paragraph = doc.add_paragraph()
-                     run = paragraph.add_run(stripped_line)
-                     if i < 3: # Apply bold and center to the first three lines
-                         run.bold = True
-                         paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                     # No specific formatting for lines beyond the second one in this block
-
-             doc.add_paragraph() # Add space after this block
-             return
-             
-        # For other sections, check if there is meaningful content before adding the title and content
-        if has_meaningful_content(content_lines, is_participant_list):
-            # Add title as a bold paragraph
-            title_para = doc.add_paragraph()
-            title_run = title_para.add_run(title)
-            title_run.bold = True # Ensure this is always applied when the condition above is met
-
-            # Re-apply bold to be sure (should not be necessary but for robustness)
-            title_run.font.bold = True
-
-            # List of problematic phrases to exclude if they appear as a full line
-            problematic_phrases = [
-                "Le PV a été validé moyennant les corrections à apporter.",
-                "Aucune conclusion formelle enregistrée.", # Fallback phrase for Conclusion
-                "Aucun acronyme n'a été trouvé dans les documents fournis.", # Fallback phrase for Acronymes
-                # Add other phrases here if they appear in future generations
-            ]
-
-            # Add the content lines as paragraphs, skipping problematic phrases
-            for line in content_lines:
-                stripped_line = line.strip()
-                if stripped_line:
-                    # Check if the stripped line is one of the problematic phrases
-                    is_problematic = any(stripped_line == phrase for phrase in problematic_phrases)
-                    
-                    if not is_problematic:
-                        doc.add_paragraph(stripped_line)
-                        
-            doc.add_paragraph() # Add a space after the section
-
-
-    current_section_title = None
-    current_section_lines = []
-
-    # Process lines from the generated text
-    for i, line in enumerate(lines):
-        stripped_line = line.strip()
-        
-        # Check if the current line is a known section title
-        is_title = False
-        for title in section_titles:
-            if stripped_line.startswith(title):
-                is_title = True
-                # If we were processing a previous section, add it to the document now
-                if current_section_title is not None:
-                    # Pass content lines (excluding the title line if it was included in collected lines)
-                    add_section_to_doc(current_section_title, current_section_lines)
-                
-                # Start a new section: set the current title and initialize collected lines
-                current_section_title = title
-                current_section_lines = [] # Start with an empty list for the new section's content
-                # Note: The title line itself is not added to current_section_lines as content
-                break
-
-        # If the line is not a section title, add it to the current section's collected lines
-        if not is_title:
-            # Only add lines if we are currently inside a section (after the first title)
-            if current_section_title is not None:
-                 current_section_lines.append(line)
-            else: # Handle any text before the first recognized section title
-                 # This part might include the main PV header block if it wasn't stripped earlier
-                 # Add these lines directly if they have content, before any titled sections begin.
-                 if stripped_line:
-                      doc.add_paragraph(stripped_line)
-
-    # After the loop, add the last section if there was one being processed
-    if current_section_title is not None:
-        add_section_to_doc(current_section_title, current_section_lines)
-
     # === Add Fixed Closing Text and Signatures ===
     doc.add_paragraph("Le Conseil d'Administration confère tous pouvoirs au porteur d'un original, d'une copie ou d'un extrait du présent procès-verbal aux fins d’accomplir toutes les formalités requises par la loi. ") # Add first closing paragraph
     doc.add_paragraph("Plus rien n'étant à l'ordre du jour et personne ne demandant la parole, le Président remercie l’ensemble des membres du Conseil d’Administration et déclare que la séance est levée. ") # Add second closing paragraph
@@ -554,11 +1831,9 @@ RC N°45349 TANGER – ICE : 000053443000022"""
     # Get the footer
     footer = section.footer
 
-    # Add standard footer text
-    date_for_footer = meeting_info.get('date', '').replace('/', '_').replace('-', '_')
-    footer_text = f"PV_CA_TMPA_{date_for_footer}"
+    # Add standard footer text (completed with the meeting date in each document)
     footer_para = footer.add_paragraph()
-    footer_para.text = footer_text
+    footer_para.text = PV_FOOTER_PREFIX
 
     # Add a tab to separate text and page number
     footer_para.add_run('\t')
@@ -608,33 +1883,212 @@ RC N°45349 TANGER – ICE : 000053443000022"""
     # The page number will align to the right_tab_pos after the tab character
     footer_para.alignment = WD_ALIGN_PARAGRAPH.LEFT # Ensure paragraph is left-aligned
 
+    return doc
+
+def get_pv_document_template():
+    global pv_document_template
+    with pv_document_template_lock:
+        if pv_document_template is None:
+            pv_document_template = build_pv_document_template()
+        return pv_document_template
+
+def copy_pv_document_template():
+    """Copies the template's document and footer parts, sharing its other parts, which no PV modifies."""
+    template = get_pv_document_template()
+    copied_parts = {template.part, template.sections[0].footer.part}
+    memo = {id(part): part for part in template.part.package.iter_parts() if part not in copied_parts}
+    # Parts only hold their root element: a fresh Document is made over the copied part, as
+    # the template's own Document caches proxies of body elements the copy would detach
+    return copy.deepcopy(template.part, memo).document
+
+def create_word_pv_document(pv_text: str, meeting_info: dict, doc=None) -> io.BytesIO:
+    """Creates a Word document from PV text and meeting information.
+
+    `doc` is the document holding the fixed parts, a copy of the PV template by default.
+    """
+    if doc is None:
+        doc = copy_pv_document_template()
+
+    # === Ajout du reste du texte généré par Gemini au corps du document ===
+    # Parse the generated text into sections, then add the sections that have content
+    preamble_lines, sections = parse_pv_sections(pv_text)
+
+    # The generated paragraphs go between the header table's spacer paragraph and the
+    # closing text, each inserted right before the first closing paragraph
+    from docx.oxml import OxmlElement
+    from docx.text.paragraph import Paragraph
+
+    body_end = doc.tables[0]._tbl.getnext().getnext()
+
+    def add_body_paragraph(text=None):
+        p = OxmlElement('w:p')
+        body_end.addprevious(p)
+        paragraph = Paragraph(p, doc._body)
+        if text:
+            paragraph.add_run(text)
+        return paragraph
+
+    # Text before the first recognized section title is added as is
+    for line in preamble_lines:
+        add_body_paragraph(line)
+
+    for pv_section in sections:
+        if not pv_section["has_content"]:
+            continue
+        # Add title as a bold paragraph
+        title_para = add_body_paragraph()
+        title_run = title_para.add_run(pv_section["title"])
+        title_run.bold = True
+        for line in pv_section["lines"]:
+            add_body_paragraph(line)
+        add_body_paragraph() # Add a space after the section
+
+    # Complete the footer text with the meeting date
+    date_for_footer = meeting_info.get('date', '').replace('/', '_').replace('-', '_')
+    doc.sections[0].footer.paragraphs[-1].runs[0].text = f"{PV_FOOTER_PREFIX}{date_for_footer}"
+
     # Save the document to a BytesIO object
     buffer = io.BytesIO()
     doc.save(buffer)
     buffer.seek(0)
     return buffer
 
+GEMINI_MODEL = 'gemini-2.0-flash'
+
+OCR_PROMPT = """Transcris précisément le texte manuscrit dans cette image.
+INSTRUCTIONS :
+1. Retourne uniquement le texte, sans commentaires
+2. Préserve la mise en forme (retours à la ligne, espacements)
+3. Conserve la ponctuation exacte
+4. Maintiens les nombres et symboles tels quels
+5. Respecte les majuscules et minuscules"""
+
+# Deuxième essai avec un prompt plus détaillé
+OCR_RETRY_PROMPT = """Analyse et transcris TOUT le texte manuscrit visible dans cette image.
+IMPORTANT :
+- Examine l'image en détail, pixel par pixel
+- Transcris absolument tout le texte visible
+- N'oublie aucun détail, même les petites annotations
+- Conserve la structure exacte du texte
+- Inclus les numéros, symboles et caractères spéciaux"""
+
+PDF_ANALYSIS_PROMPT = """Analyse ce document PDF de manière EXHAUSTIVE et DÉTAILLÉE.
+
+INSTRUCTIONS SPÉCIFIQUES :
+
+1. EXTRACTION COMPLÈTE DU CONTENU :
+   - Extraire TOUS les textes, exactement comme ils apparaissent.
+   - Conserver TOUS les chiffres, statistiques, données numériques avec leurs unités.
+   - Maintenir TOUS les tableaux avec leurs données complètes.
+   - Décrire TOUS les graphiques avec leurs valeurs précises.
+   - Capturer TOUTES les notes de bas de page et références.
+   - Respecter la structure (sections, titres, listes).
+   - NE PAS résumer ou synthétiser le corps du texte.
+   
+2. EXTRACTION DES ACRONYMES :
+   - Identifier TOUS les acronymes présents dans le document.
+   - Si l'acronyme est défini explicitement dans le texte, utiliser cette définition EXACTE.
+   - Si l'acronyme n'est PAS défini dans le texte, rechercher sa définition officielle connue dans des sources fiables.
+   - Lister les acronymes et leurs définitions SÉPARÉMENT à la fin.
+
+3. FORMAT DE SORTIE ATTENDU :
+   - D'abord, le contenu complet et détaillé du document, en respectant sa structure.
+   - Ensuite, une ligne de séparation claire comme : '--- ACRONYMES ---'.
+   - Enfin, la liste des acronymes, un par ligne, au format : 'ACRONYME: Définition complète'.
+   
+IMPORTANT : Assure-toi de bien séparer le contenu principal de la liste des acronymes avec '--- ACRONYMES ---'."""
+
+# --- Prétraitement des images avant OCR ---
+# Le travail CPU de image_preprocessing tourne dans un pool de processus. Les processus sont
+# lancés par forkserver (spawn à défaut) plutôt que par fork : ils n'héritent ni des threads
+# ni des verrous du serveur, et n'importent que image_preprocessing, sans les effets de bord
+# de app.py.
+
+OCR_PREPROCESS_WORKERS = int(os.environ.get("OCR_PREPROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+image_preprocess_executor = None
+image_preprocess_executor_lock = threading.Lock()
+
+def get_image_preprocess_executor():
+    global image_preprocess_executor
+    with image_preprocess_executor_lock:
+        if image_preprocess_executor is None:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            image_preprocess_executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=OCR_PREPROCESS_WORKERS, mp_context=multiprocessing.get_context(start_method)
+            )
+        return image_preprocess_executor
+
+def shutdown_image_preprocess_executor():
+    global image_preprocess_executor
+    with image_preprocess_executor_lock:
+        if image_preprocess_executor is not None:
+            image_preprocess_executor.shutdown(wait=False, cancel_futures=True)
+            image_preprocess_executor = None
+
+class ImagePreprocessStats:
+    """Octets envoyés à l'OCR avant et après prétraitement, et durée du prétraitement."""
+
+    def __init__(self, window=100):
+        self._lock = threading.Lock()
+        self.images = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = collections.deque(maxlen=window)
+
+    def record(self, bytes_in, bytes_out, seconds):
+        with self._lock:
+            self.images += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.seconds.append(seconds)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "images": self.images,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved_ratio": round(1 - self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+                "seconds_per_image": GenerationStats._summary(self.seconds),
+            }
+
+image_preprocess_stats = ImagePreprocessStats()
+
+def prepare_ocr_image(image_bytes):
+    """Prétraite une image dans le pool de processus. Retourne (octets, type MIME)."""
+    processed_bytes, mime_type, seconds = get_image_preprocess_executor().submit(
+        preprocess_ocr_image, image_bytes
+    ).result()
+    image_preprocess_stats.record(len(image_bytes), len(processed_bytes), seconds)
+    return processed_bytes, mime_type
+
 def process_handwritten_image(image_bytes):
+    """Extrait le texte d'une image manuscrite, en réutilisant le cache si l'image a déjà été traitée."""
+    cache_key = DiskCache.make_key(
+        image_bytes, GEMINI_MODEL, OCR_PROMPT, OCR_RETRY_PROMPT, OCR_MAX_IMAGE_SIDE, OCR_JPEG_QUALITY
+    )
+    cached_text = ocr_cache.get(cache_key)
+    if cached_text is not None:
+        print("💾 Texte OCR servi depuis le cache")
+        return cached_text
+    processed_bytes, mime_type = prepare_ocr_image(image_bytes)
+    text = transcribe_handwritten_image(processed_bytes, mime_type)
+    if text:
+        ocr_cache.set(cache_key, text)
+    return text
+
+def transcribe_handwritten_image(image_bytes, mime_type="image/jpeg"):
     """Extrait le texte d'une image manuscrite avec mécanisme de retry"""
+    # L'image est encodée une seule fois, pour tous les essais
+    image_part = {"mime_type": mime_type, "data": base64.b64encode(image_bytes).decode('utf-8')}
+    model = genai.GenerativeModel(GEMINI_MODEL)
+
     @retry_with_backoff
     def transcribe_image():
         try:
-            image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-            
-            model = genai.GenerativeModel('gemini-2.0-flash')
-            
-            prompt = """Transcris précisément le texte manuscrit dans cette image.
-            INSTRUCTIONS :
-            1. Retourne uniquement le texte, sans commentaires
-            2. Préserve la mise en forme (retours à la ligne, espacements)
-            3. Conserve la ponctuation exacte
-            4. Maintiens les nombres et symboles tels quels
-            5. Respecte les majuscules et minuscules"""
-            
-            response = model.generate_content([
-                prompt,
-                {"mime_type": "image/jpeg", "data": image_base64}
-            ])
+            with provider_limits["gemini"]:
+                response = model.generate_content([OCR_PROMPT, image_part])
             
             if response.text:
                 return response.text.strip()
@@ -656,21 +2110,8 @@ def process_handwritten_image(image_bytes):
         print("🔄 Nouvelle tentative de transcription...")
         
         # Deuxième essai avec un prompt plus détaillé
-        prompt_retry = """Analyse et transcris TOUT le texte manuscrit visible dans cette image.
-        IMPORTANT :
-        - Examine l'image en détail, pixel par pixel
-        - Transcris absolument tout le texte visible
-        - N'oublie aucun détail, même les petites annotations
-        - Conserve la structure exacte du texte
-        - Inclus les numéros, symboles et caractères spéciaux"""
-        
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-        
-        response = model.generate_content([
-            prompt_retry,
-            {"mime_type": "image/jpeg", "data": image_base64}
-        ])
+        with provider_limits["gemini"]:
+            response = model.generate_content([OCR_RETRY_PROMPT, image_part])
         
         if response.text:
             return response.text.strip()
@@ -682,41 +2123,226 @@ def process_handwritten_image(image_bytes):
         print(f"❌ Erreur lors de la reconnaissance du texte : {str(e)}")
         return ""
 
+# Nombre maximal d'images d'une même requête transcrites en parallèle
+OCR_BATCH_CONCURRENCY = int(os.environ.get("OCR_BATCH_CONCURRENCY", "4"))
+
+def timed_handwritten_ocr(image_bytes):
+    """Transcrit une image et mesure la durée de l'OCR. Retourne (texte, durée en ms)."""
+    started_at = time.perf_counter()
+    text = process_handwritten_image(image_bytes)
+    return text, round((time.perf_counter() - started_at) * 1000)
+
+async def ocr_handwritten_batch(images_bytes):
+    """Transcrit un lot d'images en parallèle, au plus OCR_BATCH_CONCURRENCY à la fois.
+
+    Chaque page est envoyée dans sa propre requête Gemini, pour que le texte reste
+    attribué sans ambiguïté à sa page. Retourne, dans l'ordre des images, un dict
+    {"success", "text" ou "error", "duration_ms"} par page.
+    """
+    semaphore = asyncio.Semaphore(max(1, OCR_BATCH_CONCURRENCY))
+
+    async def ocr_page(image_bytes):
+        async with semaphore:
+            try:
+                text, duration_ms = await run_blocking(timed_handwritten_ocr, image_bytes)
+            except Exception as e:
+                return {"success": False, "error": str(e), "duration_ms": None}
+            return {"success": True, "text": text, "duration_ms": duration_ms}
+
+    return await asyncio.gather(*[ocr_page(image_bytes) for image_bytes in images_bytes])
+
+# Les pages qui ont une couche texte (PDF natifs) sont extraites localement ; seules les pages
+# sans texte exploitable (scans, images) sont envoyées à Gemini, par plages d'au plus
+# PDF_CHUNK_PAGES pages analysées en parallèle.
+PDF_CHUNK_PAGES = int(os.environ.get("PDF_CHUNK_PAGES", "25"))
+PDF_CHUNK_WORKERS = int(os.environ.get("PDF_CHUNK_WORKERS", "4"))
+PDF_TEXT_MIN_CHARS = int(os.environ.get("PDF_TEXT_MIN_CHARS", "80"))
+
+PDF_RANGE_PROMPT_PREFIX = """Ce document est un extrait : il contient les pages {first} à {last} d'un document de {total} pages.
+Analyse uniquement ces pages.
+
+"""
+
+# "XYZ : définition" en début de ligne, et "XYZ (définition)"
+ACRONYM_COLON_PATTERN = re.compile(r"^\s*([A-Z][A-Z0-9&]{1,9})\s*[:=]\s*(.{3,150}?)\s*$", re.MULTILINE)
+ACRONYM_PARENTHESIS_PATTERN = re.compile(r"\b([A-Z][A-Z0-9&]{1,9})\s*\(([^()\n]{3,150})\)")
+# "Définition (XYZ)", la définition étant prise dans les mots qui précèdent la parenthèse
+ACRONYM_AFTER_DEFINITION_PATTERN = re.compile(r"([^()\n]{3,150}?)\s*\(([A-Z][A-Z0-9&]{1,9})\)")
+
 def process_pdf(pdf_bytes):
-    """Extrait le contenu détaillé et les acronymes d'un PDF en un seul appel."""
+    """Extrait le contenu détaillé et les acronymes d'un PDF, en réutilisant le cache si le fichier a déjà été analysé."""
+    cache_key = DiskCache.make_key(
+        pdf_bytes, GEMINI_MODEL, PDF_ANALYSIS_PROMPT, PDF_RANGE_PROMPT_PREFIX, PDF_CHUNK_PAGES, PDF_TEXT_MIN_CHARS
+    )
+    cached_result = pdf_cache.get(cache_key)
+    if cached_result is not None:
+        print("💾 Analyse PDF servie depuis le cache")
+        return cached_result
     try:
-        pdf_base64 = base64.b64encode(pdf_bytes).decode('utf-8')
-        
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        
-        prompt = """Analyse ce document PDF de manière EXHAUSTIVE et DÉTAILLÉE.
-        
-        INSTRUCTIONS SPÉCIFIQUES :
-        
-        1. EXTRACTION COMPLÈTE DU CONTENU :
-           - Extraire TOUS les textes, exactement comme ils apparaissent.
-           - Conserver TOUS les chiffres, statistiques, données numériques avec leurs unités.
-           - Maintenir TOUS les tableaux avec leurs données complètes.
-           - Décrire TOUS les graphiques avec leurs valeurs précises.
-           - Capturer TOUTES les notes de bas de page et références.
-           - Respecter la structure (sections, titres, listes).
-           - NE PAS résumer ou synthétiser le corps du texte.
-           
-        2. EXTRACTION DES ACRONYMES :
-           - Identifier TOUS les acronymes présents dans le document.
-           - Si l'acronyme est défini explicitement dans le texte, utiliser cette définition EXACTE.
-           - Si l'acronyme n'est PAS défini dans le texte, rechercher sa définition officielle connue dans des sources fiables.
-           - Lister les acronymes et leurs définitions SÉPARÉMENT à la fin.
-        
-        3. FORMAT DE SORTIE ATTENDU :
-           - D'abord, le contenu complet et détaillé du document, en respectant sa structure.
-           - Ensuite, une ligne de séparation claire comme : '--- ACRONYMES ---'.
-           - Enfin, la liste des acronymes, un par ligne, au format : 'ACRONYME: Définition complète'.
-           
-        IMPORTANT : Assure-toi de bien séparer le contenu principal de la liste des acronymes avec '--- ACRONYMES ---'."""
-        
-        @retry_with_backoff
-        def analyze_pdf_and_extract_acronyms():
+        result, complete = analyze_pdf_pages(pdf_bytes)
+    except Exception as e:
+        print(f"❌ Erreur lors de l'analyse du PDF: {str(e)}")
+        return {"summary": f"[Erreur lors de l'analyse du PDF: {str(e)}]", "acronyms": {}}
+    # Un résultat dont une plage de pages a échoué n'est pas mis en cache
+    if result["summary"] and complete:
+        pdf_cache.set(cache_key, result)
+    return result
+
+def analyze_pdf_pages(pdf_bytes):
+    """Extrait un PDF : couche texte en local, pages scannées par Gemini.
+
+    Retourne (résultat, complet) où `complet` est faux si une plage envoyée au
+    modèle a échoué malgré le nouvel essai.
+    """
+    page_texts = extract_pdf_text_layer(pdf_bytes)
+    if page_texts is None:
+        return analyze_pdf(pdf_bytes), True
+    page_count = len(page_texts)
+    text_pages = [has_usable_text(text) for text in page_texts]
+    if not any(text_pages) and page_count <= PDF_CHUNK_PAGES:
+        # PDF entièrement scanné et court : un seul appel, sur le fichier d'origine
+        return analyze_pdf(pdf_bytes), True
+    print(f"📄 PDF de {page_count} pages : {sum(text_pages)} avec couche texte, "
+          f"{page_count - sum(text_pages)} envoyées à Gemini")
+
+    # Regrouper les pages consécutives de même nature
+    runs = []
+    for page_index, has_text in enumerate(text_pages):
+        if runs and runs[-1][2] == has_text and (has_text or page_index - runs[-1][0] < PDF_CHUNK_PAGES):
+            runs[-1][1] = page_index + 1
+        else:
+            runs.append([page_index, page_index + 1, has_text])
+
+    scanned_ranges = [(start, end) for start, end, has_text in runs if not has_text]
+    scanned_results = iter(analyze_pdf_ranges(pdf_bytes, page_count, scanned_ranges))
+
+    summaries = []
+    acronyms = {}
+    complete = True
+    for start, end, has_text in runs:
+        if has_text:
+            text = "\n\n".join(page_texts[start:end])
+            result, error = {"summary": text, "acronyms": find_acronym_definitions(text)}, None
+        else:
+            result, error = next(scanned_results)
+        first, last = start + 1, end
+        if result is None:
+            complete = False
+            summaries.append(f"[Erreur lors de l'analyse des pages {first} à {last} du PDF: {error}]")
+            continue
+        summaries.append(result["summary"] if len(runs) == 1 else f"--- Pages {first} à {last} ---\n{result['summary']}")
+        for acronym, definition in result["acronyms"].items():
+            acronyms.setdefault(acronym, definition)
+    return {"summary": "\n\n".join(summaries), "acronyms": acronyms}, complete
+
+def extract_pdf_text_layer(pdf_bytes):
+    """Texte de chaque page (tableaux conservés en colonnes), ou None si le PDF ne peut pas être lu localement."""
+    try:
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        page_texts = []
+        for page in reader.pages:
+            try:
+                text = page.extract_text(extraction_mode="layout")
+            except Exception:
+                text = ""
+            page_texts.append("\n".join(line.rstrip() for line in (text or "").splitlines()).strip("\n"))
+        return page_texts
+    except Exception as e:
+        print(f"⚠️ Lecture locale du PDF impossible, analyse en un seul appel : {str(e)}")
+        return None
+
+def has_usable_text(text):
+    """Une page a une couche texte exploitable si elle contient assez de caractères alphanumériques."""
+    return sum(char.isalnum() for char in text) >= PDF_TEXT_MIN_CHARS
+
+def acronym_matches_definition(acronym, definition):
+    """Les lettres de l'acronyme doivent suivre, dans l'ordre, les initiales des mots de la définition."""
+    initials = [word[0].upper() for word in re.split(r"[\s'’\-]+", definition) if word and word[0].isalpha()]
+    letters = iter(initials)
+    return len(initials) >= 2 and all(letter in letters for letter in acronym if letter.isalpha())
+
+def find_acronym_definitions(text):
+    """Trouve les acronymes définis dans le texte ("XYZ : ...", "XYZ (...)" ou "... (XYZ)")."""
+    acronyms = {}
+    for pattern in (ACRONYM_COLON_PATTERN, ACRONYM_PARENTHESIS_PATTERN):
+        for match in pattern.finditer(text):
+            acronym, definition = match.group(1), " ".join(match.group(2).split()).rstrip(" .;,")
+            if acronym not in acronyms and acronym_matches_definition(acronym, definition):
+                acronyms[acronym] = definition
+    for match in ACRONYM_AFTER_DEFINITION_PATTERN.finditer(text):
+        words, acronym = match.group(1).split(), match.group(2)
+        if acronym in acronyms:
+            continue
+        # Les derniers mots les moins nombreux dont les initiales forment l'acronyme,
+        # de préférence en commençant par une majuscule ("Direction des ..." plutôt que "des ...")
+        candidates = [" ".join(words[-count:]).strip(" ,;:") for count in range(2, min(len(words), 10) + 1)]
+        for first_letter in (lambda definition: definition[:1], lambda definition: definition[:1].upper()):
+            definition = next((
+                candidate for candidate in candidates
+                if first_letter(candidate) == acronym[0] and acronym_matches_definition(acronym, candidate)
+            ), None)
+            if definition:
+                acronyms[acronym] = definition
+                break
+    return acronyms
+
+def split_pdf_pages(pdf_bytes, page_ranges):
+    """Extrait chaque plage de pages (début inclus, fin exclue, à partir de 0) dans un PDF à part."""
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    range_pdfs = []
+    for start, end in page_ranges:
+        writer = PdfWriter()
+        for page_index in range(start, end):
+            writer.add_page(reader.pages[page_index])
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        range_pdfs.append(buffer.getvalue())
+    return range_pdfs
+
+def analyze_pdf_ranges(pdf_bytes, page_count, page_ranges):
+    """Analyse des plages de pages avec Gemini, en parallèle.
+
+    Une plage qui échoue est réessayée seule. Retourne, dans l'ordre des plages,
+    un couple (résultat, None) ou (None, erreur) par plage.
+    """
+    if not page_ranges:
+        return []
+    range_pdfs = split_pdf_pages(pdf_bytes, page_ranges)
+
+    def analyze_range(index):
+        first, last = page_ranges[index][0] + 1, page_ranges[index][1]
+        prompt = PDF_RANGE_PROMPT_PREFIX.format(first=first, last=last, total=page_count) + PDF_ANALYSIS_PROMPT
+        try:
+            result = analyze_pdf(range_pdfs[index], prompt)
+        except Exception as e:
+            print(f"⚠️ Échec de l'analyse des pages {first}-{last} : {str(e)}")
+            return None, str(e)
+        if not result["summary"]:
+            return None, "aucun contenu extrait"
+        return result, None
+
+    outcomes = [None] * len(page_ranges)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(PDF_CHUNK_WORKERS, len(page_ranges)))) as executor:
+        futures = {executor.submit(analyze_range, index): index for index in range(len(page_ranges))}
+        for future in concurrent.futures.as_completed(futures):
+            outcomes[futures[future]] = future.result()
+
+    # Nouvel essai, plage par plage, pour celles qui ont échoué
+    for index, (result, _) in enumerate(outcomes):
+        if result is None:
+            print(f"🔄 Nouvelle analyse des pages {page_ranges[index][0] + 1}-{page_ranges[index][1]}...")
+            outcomes[index] = analyze_range(index)
+    return outcomes
+
+def analyze_pdf(pdf_bytes, prompt=PDF_ANALYSIS_PROMPT):
+    """Extrait le contenu détaillé et les acronymes d'un PDF en un seul appel."""
+    pdf_base64 = base64.b64encode(pdf_bytes).decode('utf-8')
+    
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    
+    @retry_with_backoff
+    def analyze_pdf_and_extract_acronyms():
+        with provider_limits["gemini"]:
             response = model.generate_content([
                 {
                     "role": "user",
@@ -726,39 +2352,126 @@ def process_pdf(pdf_bytes):
                     ]
                 }
             ])
-            return response.text if response.text else ""
+        return response.text if response.text else ""
+    
+    full_result = analyze_pdf_and_extract_acronyms()
+    
+    if not full_result:
+        print(f"⚠️ Aucun contenu extrait du PDF")
+        return {"summary": "", "acronyms": {}}
         
-        full_result = analyze_pdf_and_extract_acronyms()
+    # Séparer le contenu et les acronymes
+    separator = "--- ACRONYMES ---"
+    if separator in full_result:
+        summary_part, acronym_part = full_result.split(separator, 1)
+        summary = summary_part.strip()
         
-        if not full_result:
-            print(f"⚠️ Aucun contenu extrait du PDF")
-            return {"summary": "", "acronyms": {}}
-            
-        # Séparer le contenu et les acronymes
-        separator = "--- ACRONYMES ---"
-        if separator in full_result:
-            summary_part, acronym_part = full_result.split(separator, 1)
-            summary = summary_part.strip()
-            
-            # Parser les acronymes
-            acronyms = {}
-            lines = acronym_part.strip().split('\n')
-            for line in lines:
-                if ':' in line:
-                    acronym, definition = line.split(':', 1)
-                    acronym = acronym.strip().upper()
-                    definition = definition.strip()
-                    if acronym and definition:
-                        acronyms[acronym] = definition
-            return {"summary": summary, "acronyms": acronyms}
-        else:
-            # Si le séparateur n'est pas trouvé, retourner tout comme résumé et pas d'acronymes
-            print(f"⚠️ Séparateur d'acronymes non trouvé dans l'analyse")
-            return {"summary": full_result.strip(), "acronyms": {}}
-            
+        # Parser les acronymes
+        acronyms = {}
+        lines = acronym_part.strip().split('\n')
+        for line in lines:
+            if ':' in line:
+                acronym, definition = line.split(':', 1)
+                acronym = acronym.strip().upper()
+                definition = definition.strip()
+                if acronym and definition:
+                    acronyms[acronym] = definition
+        return {"summary": summary, "acronyms": acronyms}
+    else:
+        # Si le séparateur n'est pas trouvé, retourner tout comme résumé et pas d'acronymes
+        print(f"⚠️ Séparateur d'acronymes non trouvé dans l'analyse")
+        return {"summary": full_result.strip(), "acronyms": {}}
+
+# --- Media Processing Stages ---
+# Blocking, self-contained stages of the PV pipeline. Endpoints run them through run_blocking.
+
+def transcribe_video_source(temp_dir, video_path=None, google_drive_url=None, priority=PRIORITY_INTERACTIVE,
+                            manifest=None):
+    """Download (if needed), verify and transcribe a video, recording the run in `manifest` if given.
+
+    Returns the transcript or an error placeholder.
+    """
+    try:
+        if google_drive_url:
+            # Download from Drive, extracting and transcribing while the bytes arrive
+            transcript_segments, err = transcribe_drive_video(google_drive_url, temp_dir, priority=priority,
+                                                              manifest=manifest)
+            if err:
+                print(f"Drive video processing failed: {err}") # Debug print
+                return f"[{err}]"
+            print("Video transcription completed.") # Debug print
+            return "\n".join(transcript_segments)
+
+        # Verify video
+        valid, err = verify_video_file(video_path)
+        if not valid:
+            print(f"Video verification failed: {err}") # Debug print
+            return f"[Erreur de vérification vidéo: {err}]"
+
+        # Extract Whisper-ready chunks straight from the video and transcribe them as a pipeline
+        transcript_segments = transcribe_audio_file(video_path, chunk_format=WHISPER_CHUNK_FORMAT, priority=priority,
+                                                    manifest=manifest)
+        if not transcript_segments:
+            print("Audio extraction failed for video") # Debug print
+            return "[Erreur d'extraction audio vidéo]"
+        print("Video transcription completed.") # Debug print
+        return "\n".join(transcript_segments)
+
     except Exception as e:
-        print(f"❌ Erreur lors de l'analyse du PDF: {str(e)}")
-        return {"summary": f"[Erreur lors de l'analyse du PDF: {str(e)}]", "acronyms": {}}
+        print(f"Error processing video/Google Drive URL: {str(e)}") # Debug print
+        return f"[Erreur de traitement vidéo/URL: {str(e)}]"
+
+def transcribe_audio_source(i, audio_file_path, priority=PRIORITY_INTERACTIVE, manifest=None):
+    """Transcribe one uploaded audio file, recording the run in `manifest` if given.
+
+    The upload is decoded as is, whatever its container, straight into Whisper-ready chunks.
+    Returns the transcript or an error placeholder.
+    """
+    try:
+        transcript_segments = transcribe_audio_file(
+            audio_file_path, chunk_format=WHISPER_CHUNK_FORMAT, priority=priority, manifest=manifest
+        )
+        if not transcript_segments:
+            print(f"Audio segmentation failed for file {i}") # Debug print
+            return f"[Échec de la segmentation audio fichier {i}]"
+        print(f"Audio transcription completed for file {i}.") # Debug print
+        return "\n".join(transcript_segments)
+
+    except Exception as e:
+        print(f"Error processing audio file {i}: {str(e)}") # Debug print
+        return f"[Erreur de traitement audio fichier {i}: {str(e)}]"
+
+def ocr_image_file(i, image_file_path):
+    """Run handwriting OCR on one saved image. Returns the text or an error placeholder."""
+    try:
+        # Read image bytes from saved file
+        with open(image_file_path, "rb") as f:
+            image_bytes = f.read()
+
+        # Process image for OCR
+        ocr_text = process_handwritten_image(image_bytes)
+        print(f"OCR processing completed for image {i}.") # Debug print
+        return ocr_text
+
+    except Exception as e:
+        print(f"Error processing image file {i}: {str(e)}") # Debug print
+        return f"[Erreur de traitement image fichier {i}: {str(e)}]"
+
+def process_pdf_file(i, pdf_file_path):
+    """Extract content and acronyms from one saved PDF. Returns a {"summary", "acronyms"} dict."""
+    try:
+        # Read PDF bytes from saved file
+        with open(pdf_file_path, "rb") as f:
+            pdf_bytes = f.read()
+
+        # Process PDF
+        pdf_result = process_pdf(pdf_bytes)
+        print(f"PDF processing completed for file {i}.") # Debug print
+        return pdf_result
+
+    except Exception as e:
+        print(f"Error processing PDF file {i}: {str(e)}") # Debug print
+        return {"summary": f"[Erreur de traitement PDF fichier {i}: {str(e)}]", "acronyms": {}}
 
 # --- Dependencies ---
 
@@ -783,48 +2496,294 @@ async def require_video_or_audio(
             detail="At least one video or audio file or Google Drive URL is required for PV generation."
         )
 
+# --- Gemini Streaming ---
+
+class GenerationStats:
+    """Time to first token and total duration of streamed Gemini generations (last 100 calls)."""
+
+    def __init__(self, window=100):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.first_token_seconds = collections.deque(maxlen=window)
+        self.total_seconds = collections.deque(maxlen=window)
+
+    def record(self, first_token_seconds, total_seconds):
+        with self._lock:
+            self.calls += 1
+            if first_token_seconds is not None:
+                self.first_token_seconds.append(first_token_seconds)
+            self.total_seconds.append(total_seconds)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    @staticmethod
+    def _summary(samples):
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return {
+            "avg": round(sum(ordered) / len(ordered), 3),
+            "p50": round(ordered[len(ordered) // 2], 3),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+            "max": round(ordered[-1], 3),
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "time_to_first_token_seconds": self._summary(self.first_token_seconds),
+                "total_seconds": self._summary(self.total_seconds),
+            }
+
+gemini_generation_stats = GenerationStats()
+
+def is_retryable_api_error(e):
+    """Rate limits (429), cancelled requests (499) and server errors (5xx) are worth retrying."""
+    code = getattr(e, "code", None)
+    if isinstance(code, int):
+        # google.api_core exceptions carry the HTTP status
+        return code in (429, 499) or code >= 500
+    return any(status_code in str(e) for status_code in ("429", "499", "500", "502", "503", "504"))
+
+async def stream_gemini_text(prompt, timeout=180, max_retries=5, initial_delay=1):
+    """Stream a Gemini completion, yielding text as it arrives.
+
+    Retryable errors (see is_retryable_api_error) raised before the first piece of
+    text are retried with exponential backoff and jitter, awaited without blocking
+    the event loop; once text has been yielded, errors propagate. Time to first
+    token, measured from the call including queueing and retries, is recorded in
+    gemini_generation_stats.
+    """
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    started_at = time.perf_counter()
+    first_token_at = None
+    delay = initial_delay
+    for attempt in range(max_retries):
+        async with provider_slot("gemini"):
+            try:
+                response = await model.generate_content_async(
+                    [{"role": "user", "parts": [prompt]}],
+                    stream=True,
+                    request_options={"timeout": timeout}
+                )
+                async for chunk in response:
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        continue  # Chunks without text parts (e.g. the final finish reason)
+                    if not text:
+                        continue
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        print(f"⏱️ Gemini first token after {first_token_at - started_at:.2f} s")
+                    yield text
+                break
+            except Exception as e:
+                if first_token_at is not None or not is_retryable_api_error(e) or attempt == max_retries - 1:
+                    raise
+                gemini_generation_stats.record_retry()
+                print(f"⚠️ Erreur API ({str(e)}), nouvelle tentative {attempt + 1}/{max_retries} dans {delay} secondes...")
+        await asyncio.sleep(delay + random.uniform(0, 1))
+        delay *= 2
+    total = time.perf_counter() - started_at
+    gemini_generation_stats.record(None if first_token_at is None else first_token_at - started_at, total)
+
 # --- PV Text Generation Function ---
+
+# Token budget of the processed content sent in the final PV prompt. Beyond it, the large
+# sources are first condensed window by window in parallel (map), and the PV is written
+# from the condensed versions (reduce), so prompt size stays bounded.
+PV_PROMPT_TOKEN_BUDGET = int(os.environ.get("PV_PROMPT_TOKEN_BUDGET", "120000"))
+PV_MAP_WINDOW_TOKENS = int(os.environ.get("PV_MAP_WINDOW_TOKENS", "16000"))
+PV_MAP_MIN_TOKENS = 2000  # Smaller sources are always sent verbatim
+PV_MAP_MAX_ROUNDS = 3
+CHARS_PER_TOKEN = 4
+
+PV_MAP_PROMPT = """Tu prépares la rédaction du procès-verbal d'un conseil d'administration.
+Voici un extrait ({label}, partie {part}/{parts}) du contenu de la réunion.
+
+Rédige une synthèse factuelle et détaillée de cet extrait :
+- Points de l'ordre du jour abordés, avec leur numéro s'il est mentionné
+- Discussions et interventions importantes, avec le nom ou la fonction des intervenants
+- Décisions prises et résolutions adoptées
+- Chiffres, montants, dates et échéances, avec leurs unités
+- Actions à entreprendre et prochaines étapes
+- Acronymes rencontrés et leur définition
+
+IMPORTANT : N'invente rien, conserve uniquement les informations présentes dans l'extrait.
+Ne rédige pas le procès-verbal lui-même.
+
+EXTRAIT :
+{text}"""
+
+pv_summary_cache = DiskCache(os.path.join(CACHE_DIR, "pv_summaries"), RESULT_CACHE_MAX_BYTES, ttl=RESULT_CACHE_TTL)
+
+def estimate_tokens(text):
+    """Rough Gemini token count of a text, good enough for budgeting prompts."""
+    return len(text) // CHARS_PER_TOKEN
+
+def split_into_windows(text, max_tokens):
+    """Split text on line boundaries into windows of at most max_tokens (longer lines are cut)."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    windows = []
+    current = ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                windows.append(current)
+                current = ""
+            windows.append(line[:max_chars])
+            line = line[max_chars:]
+        if len(current) + len(line) > max_chars:
+            windows.append(current)
+            current = ""
+        current += line
+    if current.strip():
+        windows.append(current)
+    return windows
+
+def summarize_pv_window(label, part, parts, text):
+    """Condense one window of a source for the PV (map step). Falls back to the window itself on failure."""
+    prompt = PV_MAP_PROMPT.format(label=label, part=part, parts=parts, text=text)
+    cache_key = DiskCache.make_key(GEMINI_MODEL, prompt)
+    cached_summary = pv_summary_cache.get(cache_key)
+    if cached_summary is not None:
+        print(f"💾 Synthèse de {label} ({part}/{parts}) servie depuis le cache")
+        return cached_summary
+
+    model = genai.GenerativeModel(GEMINI_MODEL)
+
+    @retry_with_backoff
+    def call_gemini_for_summary():
+        with provider_limits["gemini"]:
+            response = model.generate_content(
+                [{"role": "user", "parts": [prompt]}],
+                request_options={"timeout": 120}
+            )
+        return response.text if response.text else ""
+
+    try:
+        summary = call_gemini_for_summary()
+    except Exception as e:
+        print(f"⚠️ Synthèse de {label} ({part}/{parts}) échouée : {str(e)}")
+        summary = None
+    if not summary or not summary.strip():
+        return text
+    summary = summary.strip()
+    pv_summary_cache.set(cache_key, summary)
+    return summary
+
+async def condense_text(label, text):
+    """Map every window of a long source in parallel and join the summaries in order."""
+    windows = split_into_windows(text, PV_MAP_WINDOW_TOKENS)
+    summaries = await asyncio.gather(*[
+        run_blocking(summarize_pv_window, label, part, len(windows), window)
+        for part, window in enumerate(windows, 1)
+    ])
+    return "\n\n".join(summaries)
+
+async def condense_pv_sources(video_transcript, audio_transcripts_list, ocr_texts_list, pdf_results_list):
+    """Condense the large sources until the combined content fits PV_PROMPT_TOKEN_BUDGET.
+
+    Every source above PV_MAP_MIN_TOKENS is summarized window by window, all windows
+    in parallel; PDF acronyms are kept as they are. Rounds repeat on the summaries
+    (at most PV_MAP_MAX_ROUNDS) while the result is still over budget. Returns the
+    combined text built from the condensed sources.
+    """
+    video_transcript = video_transcript or ""
+    pdf_results_list = [dict(res) for res in pdf_results_list if res]
+    labels = (
+        ["la transcription vidéo"]
+        + [f"l'enregistrement audio {i + 1}" for i in range(len(audio_transcripts_list))]
+        + [f"la note manuscrite {i + 1}" for i in range(len(ocr_texts_list))]
+        + [f"le document PDF {i + 1}" for i in range(len(pdf_results_list))]
+    )
+    texts = [video_transcript, *audio_transcripts_list, *ocr_texts_list, *[res.get("summary", "") for res in pdf_results_list]]
+    audio_end = 1 + len(audio_transcripts_list)
+    ocr_end = audio_end + len(ocr_texts_list)
+
+    round_number = 0
+    while True:
+        video_transcript, audio_transcripts_list, ocr_texts_list = texts[0], texts[1:audio_end], texts[audio_end:ocr_end]
+        for res, summary in zip(pdf_results_list, texts[ocr_end:]):
+            res["summary"] = summary
+        combined_text = build_combined_text(video_transcript, audio_transcripts_list, ocr_texts_list, pdf_results_list)
+        tokens = estimate_tokens(combined_text)
+        if tokens <= PV_PROMPT_TOKEN_BUDGET:
+            return combined_text
+        large = [i for i, text in enumerate(texts) if estimate_tokens(text) > PV_MAP_MIN_TOKENS]
+        if not large or round_number == PV_MAP_MAX_ROUNDS:
+            print(f"⚠️ Contenu toujours au-dessus du budget après synthèse (~{tokens} tokens)")
+            return combined_text
+        round_number += 1
+        print(f"📚 Contenu trop long pour un seul appel (~{tokens} tokens), synthèse parallèle de "
+              f"{len(large)} source(s) (passe {round_number})...")
+        condensed = await asyncio.gather(*[condense_text(labels[i], texts[i]) for i in large])
+        for i, text in zip(large, condensed):
+            texts[i] = text
+
+def build_combined_text(video_transcript, audio_transcripts_list, ocr_texts_list, pdf_results_list):
+    """Combine the processed media into the 'Contenu Traité Brut' block of the PV prompt."""
+    combined_text = ""
+
+    if video_transcript:
+        combined_text += "[TRANSCRIPTION VIDÉO]\n" + video_transcript.strip() + "\n\n"
+
+    if audio_transcripts_list:
+        combined_text += "[ENREGISTREMENTS AUDIO]\n"
+        combined_text += "\n---\n".join([t.strip() for t in audio_transcripts_list if t.strip()]) + "\n\n"
+
+    if ocr_texts_list:
+        combined_text += "[NOTES MANUSCRITES (OCR)]\n"
+        combined_text += "\n---\n".join([t.strip() for t in ocr_texts_list if t.strip()]) + "\n\n"
+
+    if pdf_results_list:
+        combined_text += "[DOCUMENTS PDF]\n"
+        # Combine summaries
+        combined_pdf_summaries = "\n---\n".join([res["summary"].strip() for res in pdf_results_list if res and "summary" in res and res["summary"].strip()])
+        if combined_pdf_summaries:
+             combined_text += "## Résumés :\n" + combined_pdf_summaries + "\n\n"
+
+        # Combine acronyms
+        all_acronyms = {}
+        for res in pdf_results_list:
+             if res and "acronyms" in res:
+                 all_acronyms.update(res["acronyms"])
+
+        if all_acronyms:
+             combined_text += "## Acronymes :\n"
+             for acronym, definition in all_acronyms.items():
+                  combined_text += f"{acronym}: {definition}\n"
+        combined_text += "\n"
+
+    return combined_text
+
 async def generate_pv_text_with_gemini(
     meeting_info: dict,
     video_transcript: str,
     audio_transcripts_list: List[str],
     ocr_texts_list: List[str],
-    pdf_results_list: List[dict]
+    pdf_results_list: List[dict],
+    on_text=None
 ) -> str:
-    """Generates structured PV text using Gemini based on processed media content and meeting info."""
+    """Generates structured PV text using Gemini based on processed media content and meeting info.
+
+    `on_text`, if given, is called with each raw piece of text as Gemini streams it;
+    the returned text is the cleaned-up complete PV.
+    """
     try:
         # Combine all processed text sources into a single string for the prompt
-        combined_text = ""
-
-        if video_transcript:
-            combined_text += "[TRANSCRIPTION VIDÉO]\n" + video_transcript.strip() + "\n\n"
-
-        if audio_transcripts_list:
-            combined_text += "[ENREGISTREMENTS AUDIO]\n"
-            combined_text += "\n---\n".join([t.strip() for t in audio_transcripts_list if t.strip()]) + "\n\n"
-
-        if ocr_texts_list:
-            combined_text += "[NOTES MANUSCRITES (OCR)]\n"
-            combined_text += "\n---\n".join([t.strip() for t in ocr_texts_list if t.strip()]) + "\n\n"
-
-        if pdf_results_list:
-            combined_text += "[DOCUMENTS PDF]\n"
-            # Combine summaries
-            combined_pdf_summaries = "\n---\n".join([res["summary"].strip() for res in pdf_results_list if res and "summary" in res and res["summary"].strip()])
-            if combined_pdf_summaries:
-                 combined_text += "## Résumés :\n" + combined_pdf_summaries + "\n\n"
-
-            # Combine acronymsimage.png
-            all_acronyms = {}
-            for res in pdf_results_list:
-                 if res and "acronyms" in res:
-                     all_acronyms.update(res["acronyms"])
-
-            if all_acronyms:
-                 combined_text += "## Acronymes :\n"
-                 for acronym, definition in all_acronyms.items():
-                      combined_text += f"{acronym}: {definition}\n"
-            combined_text += "\n"
+        combined_text = build_combined_text(video_transcript, audio_transcripts_list, ocr_texts_list, pdf_results_list)
+        if estimate_tokens(combined_text) > PV_PROMPT_TOKEN_BUDGET:
+            # Too long for one call: condense the large sources with parallel map calls first
+            combined_text = await condense_pv_sources(
+                video_transcript, audio_transcripts_list, ocr_texts_list, pdf_results_list
+            )
 
         if not combined_text.strip():
             return "Aucun contenu médiatique traité pour générer le PV."
@@ -914,19 +2873,14 @@ INSTRUCTIONS POUR LA GÉNÉRATION DU PV :
 -  Ne pas afficher le placeholder dans le texte final.
 """
 
-        model = genai.GenerativeModel('gemini-2.0-flash')
-
-        @retry_with_backoff
-        async def call_gemini_for_pv():
-            print("Attempting Gemini call for PV generation...") # Debug print
-            response = model.generate_content(
-                [{"role": "user", "parts": [full_prompt_content]}],  # Pass prompt as parts in a user role
-                request_options={"timeout": 180} # Increased timeout
-            )
-            print(f"Gemini PV generation response status: {response.candidates[0].finish_reason if response.candidates else 'No candidates'}") # Debug print
-            return response.text if response.text else ""
-
-        generated_text = await call_gemini_for_pv()
+        # Stream the PV as Gemini writes it, handing each piece to on_text as it arrives
+        print("Attempting Gemini call for PV generation...") # Debug print
+        generated_parts = []
+        async for text in stream_gemini_text(full_prompt_content, timeout=180):
+            generated_parts.append(text)
+            if on_text:
+                on_text(text)
+        generated_text = "".join(generated_parts)
 
         if not generated_text or not generated_text.strip():
             print("⚠️ Gemini generated empty PV text.") # Debug print
@@ -971,12 +2925,485 @@ INSTRUCTIONS POUR LA GÉNÉRATION DU PV :
         print("PV text generation completed by Gemini.") # Debug print
         return generated_text.strip()
 
+    except StreamClosed:
+        raise
     except Exception as e:
         print(f"❌ Error during PV text generation: {str(e)}") # Debug print
         return f"[Erreur lors de la génération du texte du PV : {str(e)}]"
 
+# --- PV Pipeline ---
+# Shared by the synchronous /generate_pv endpoint and the background job workers.
+
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+def pv_filename(meeting_info):
+    """Download filename of the PV document for a meeting."""
+    date_for_filename = meeting_info.get('date', 'N/A').replace('/', '_').replace('-', '_')
+    return f"Procès-Verbal_{date_for_filename}.docx"
+
+DOCX_CHUNK_SIZE = 64 * 1024
+
+def docx_response(word_document_buffer, filename, headers=None):
+    """Stream a generated .docx from its buffer in DOCX_CHUNK_SIZE chunks, without copying it.
+
+    Each POST generates a new document, so there is no Range support here: resumable
+    downloads are served by GET /jobs/{job_id}/result from the stored file.
+    """
+    data = word_document_buffer.getbuffer()
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Content-Length": str(len(data)),
+        **(headers or {}),
+    }
+
+    async def chunks():
+        # Slices of the memoryview share the buffer's memory; an async generator keeps
+        # the chunks on the event loop instead of a threadpool hop per chunk
+        try:
+            for offset in range(0, len(data), DOCX_CHUNK_SIZE):
+                yield data[offset:offset + DOCX_CHUNK_SIZE]
+        finally:
+            data.release()
+
+    return StreamingResponse(chunks(), media_type=DOCX_MEDIA_TYPE, headers=headers)
+
+async def save_upload(upload_file, path):
+    """Stream an UploadFile to disk in 1 MB chunks."""
+    with open(path, 'wb') as f:
+        while True:
+            chunk = await upload_file.read(1024 * 1024)
+            if not chunk:
+                break
+            f.write(chunk)
+
+async def save_pv_uploads(target_dir, video, audio, images, pdfs):
+    """Save the PV media uploads into target_dir. Returns (video_path, audio_paths, image_paths, pdf_paths)."""
+    video_path = None
+    audio_paths = []
+    image_paths = []
+    pdf_paths = []
+
+    # Save Video File
+    if video:
+        video_filename = video.filename if video.filename else "video.mp4"
+        video_path = os.path.join(target_dir, video_filename)
+        await save_upload(video, video_path)
+        print(f"Saved video to: {video_path}") # Debug print
+
+    # Save Audio Files
+    for i, audio_file in enumerate(audio):
+        audio_filename = audio_file.filename if audio_file.filename else f"audio_{i}.mp3"
+        audio_path = os.path.join(target_dir, audio_filename)
+        await save_upload(audio_file, audio_path)
+        audio_paths.append(audio_path)
+        print(f"Saved audio file {i} to: {audio_path}") # Debug print
+
+    # Save Image Files
+    for i, image_file in enumerate(images):
+        image_filename = image_file.filename if image_file.filename else f"image_{i}.png"
+        image_path = os.path.join(target_dir, image_filename)
+        await save_upload(image_file, image_path)
+        image_paths.append(image_path)
+        print(f"Saved image file {i} to: {image_path}") # Debug print
+
+    # Save PDF Files
+    for i, pdf_file in enumerate(pdfs):
+        pdf_filename = pdf_file.filename if pdf_file.filename else f"pdf_{i}.pdf"
+        pdf_path = os.path.join(target_dir, pdf_filename)
+        await save_upload(pdf_file, pdf_path)
+        pdf_paths.append(pdf_path)
+        print(f"Saved PDF file {i} to: {pdf_path}") # Debug print
+
+    return video_path, audio_paths, image_paths, pdf_paths
+
+async def process_pv_sources(temp_dir, video_path, google_drive_url, audio_paths, image_paths, pdf_paths, report,
+                             priority=PRIORITY_INTERACTIVE, session_id=None):
+    """Run every media source through its processing stage, all of them concurrently.
+
+    `report(stage, percent)` is advanced from 5 to 80% as sources complete.
+    Returns the processed inputs: {"video_transcript", "audio_transcripts_list",
+    "ocr_texts_list", "pdf_results_list"}, lists in upload order, plus the
+    "transcription_ids" ({"video", "audio"}) of the transcription manifests. The
+    manifests are linked to `session_id`, so retrying their failed chunks repairs
+    the session's transcripts.
+    """
+    has_video = bool(video_path or google_drive_url)
+    video_manifest = TranscriptionManifest(
+        source=google_drive_url or os.path.basename(video_path), session_id=session_id
+    ) if has_video else None
+    audio_manifests = [
+        TranscriptionManifest(source=os.path.basename(audio_file_path), session_id=session_id)
+        for audio_file_path in audio_paths
+    ]
+
+    # --- Processing logic starts here ---
+    # The sources are independent, so they all run concurrently; the provider
+    # schedulers keep the number of in-flight Whisper/Gemini calls bounded.
+    print("Starting media processing...") # Debug print
+    print(f"Processing video: {bool(video_path or google_drive_url)}, {len(audio_paths)} audio, "
+          f"{len(image_paths)} image and {len(pdf_paths)} PDF file(s) concurrently...") # Debug print
+
+    total_sources = int(bool(video_path or google_drive_url)) + len(audio_paths) + len(image_paths) + len(pdf_paths)
+    completed_sources = 0
+    report("processing", 5)
+
+    async def tracked(awaitable):
+        # Media processing covers 5-80% of the job, advanced as each source completes
+        nonlocal completed_sources
+        result = await awaitable
+        completed_sources += 1
+        report("processing", 5 + int(75 * completed_sources / max(1, total_sources)))
+        return result
+
+    async def no_video():
+        return ""
+
+    video_transcript, audio_transcripts_list, ocr_texts_list, pdf_results_list = await asyncio.gather(
+        # Video (if uploaded) or Google Drive URL
+        tracked(run_blocking(transcribe_video_source, temp_dir, video_path, google_drive_url, priority, video_manifest))
+        if video_path or google_drive_url else no_video(),
+        asyncio.gather(*[
+            tracked(run_blocking(transcribe_audio_source, i, audio_file_path, priority, audio_manifests[i]))
+            for i, audio_file_path in enumerate(audio_paths)
+        ]),
+        asyncio.gather(*[
+            tracked(run_blocking(ocr_image_file, i, image_file_path))
+            for i, image_file_path in enumerate(image_paths)
+        ]),
+        asyncio.gather(*[
+            tracked(run_blocking(process_pdf_file, i, pdf_file_path))
+            for i, pdf_file_path in enumerate(pdf_paths)
+        ]),
+    )
+    # --- Processing logic ends here ---
+    return {
+        "video_transcript": video_transcript,
+        "audio_transcripts_list": list(audio_transcripts_list), # Transcripts from multiple audio files, in upload order
+        "ocr_texts_list": list(ocr_texts_list), # Texts from multiple image files, in upload order
+        "pdf_results_list": list(pdf_results_list), # Results from multiple PDF files, in upload order
+        "transcription_ids": {
+            "video": video_manifest.run_id if video_manifest else None,
+            "audio": [manifest.run_id for manifest in audio_manifests],
+        },
+    }
+
+async def render_pv_document(meeting_info, sources, report, on_text=None):
+    """Generate the PV text from processed inputs and build the Word document.
+
+    Returns (generated_pv_text, word_document_buffer).
+    """
+    print("Starting PV generation...") # Debug print
+    report("generating", 80)
+    generated_pv_text = await generate_pv_text_with_gemini(
+        meeting_info,
+        sources["video_transcript"],
+        sources["audio_transcripts_list"],
+        sources["ocr_texts_list"],
+        sources["pdf_results_list"],
+        on_text=on_text
+    )
+    print("PV generation process completed.") # Debug print
+
+    # Create Word document
+    print("Creating Word document...") # Debug print
+    report("document", 95)
+    word_document_buffer = await run_blocking(create_word_pv_document, generated_pv_text, meeting_info)
+    report("done", 100)
+    return generated_pv_text, word_document_buffer
+
+async def build_pv_document(meeting_info, temp_dir, video_path, audio_paths, image_paths, pdf_paths, progress=None,
+                            priority=PRIORITY_INTERACTIVE, on_text=None, session_id=None):
+    """Process the saved media, generate the PV text and build the Word document.
+
+    `progress`, if given, is called as progress(stage, percent) as the pipeline advances.
+    `priority` orders this request's Whisper calls in the shared scheduler.
+    `on_text`, if given, receives the PV text as Gemini streams it.
+    With `session_id`, the processed inputs are saved as a PV session so the PV can
+    be regenerated later without processing the media again.
+    Returns (generated_pv_text, word_document_buffer).
+    """
+    def report(stage, percent):
+        if progress:
+            progress(stage, percent)
+
+    # Access Google Drive URL if present
+    google_drive_url = meeting_info.get("googleDriveUrl")
+
+    sources = await process_pv_sources(
+        temp_dir, video_path, google_drive_url, audio_paths, image_paths, pdf_paths, report, priority, session_id
+    )
+    if session_id:
+        await run_store(save_pv_session, session_id, meeting_info, sources)
+    return await render_pv_document(meeting_info, sources, report, on_text)
+
+# --- PV Job Queue ---
+# Long PV generations run as background jobs: submission returns a job ID right away,
+# a bounded pool of workers drains an in-process queue, and job state lives in SQLite
+# so status and results survive restarts on a single box without an external broker.
+
+PV_JOBS_DIR = os.environ.get("PV_JOBS_DIR", os.path.join(tempfile.gettempdir(), "pv_jobs"))
+PV_JOBS_DB = os.path.join(PV_JOBS_DIR, "jobs.sqlite3")
+PV_JOB_WORKERS = int(os.environ.get("PV_JOB_WORKERS", "2"))
+PV_JOB_QUEUE_SIZE = int(os.environ.get("PV_JOB_QUEUE_SIZE", "20"))
+PV_JOB_TTL = float(os.environ.get("PV_JOB_TTL_DAYS", "7")) * 86400
+
+pv_job_queue = None
+
+def _jobs_db():
+    conn = sqlite3.connect(PV_JOBS_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_job_store():
+    """Create the job table, prune expired jobs and return the IDs of jobs interrupted by a restart."""
+    os.makedirs(PV_JOBS_DIR, exist_ok=True)
+    with closing(_jobs_db()) as conn, conn:
+        conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            stage TEXT,
+            progress INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            meeting_data TEXT NOT NULL,
+            inputs TEXT NOT NULL,
+            result_path TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )""")
+        rows = conn.execute(
+            "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+        ).fetchall()
+        conn.execute(
+            "UPDATE jobs SET status = 'queued', stage = 'queued', progress = 0 WHERE status = 'running'"
+        )
+    prune_pv_jobs()
+    return [row["id"] for row in rows]
+
+def prune_pv_jobs():
+    """Delete finished jobs, with their directory and result, last updated more than PV_JOB_TTL ago."""
+    with closing(_jobs_db()) as conn, conn:
+        rows = conn.execute(
+            "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+            (time.time() - PV_JOB_TTL,)
+        ).fetchall()
+        for row in rows:
+            shutil.rmtree(os.path.join(PV_JOBS_DIR, row["id"]), ignore_errors=True)
+            conn.execute("DELETE FROM jobs WHERE id = ?", (row["id"],))
+    if rows:
+        print(f"🧹 Pruned {len(rows)} expired PV job(s)")
+
+def create_job(job_id, meeting_data, inputs):
+    now = time.time()
+    with closing(_jobs_db()) as conn, conn:
+        conn.execute(
+            "INSERT INTO jobs (id, status, stage, progress, meeting_data, inputs, created_at, updated_at) "
+            "VALUES (?, 'queued', 'queued', 0, ?, ?, ?, ?)",
+            (job_id, meeting_data, json.dumps(inputs), now, now)
+        )
+
+def update_job(job_id, **fields):
+    fields["updated_at"] = time.time()
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    with closing(_jobs_db()) as conn, conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+def report_job_progress(job_id, stage, percent):
+    """Record the progress of a running job; never moves it backwards.
+
+    Progress reports are written from executor threads in no guaranteed order, so an
+    update older than the stored progress (or landing after the job finished) is ignored.
+    """
+    with closing(_jobs_db()) as conn, conn:
+        conn.execute(
+            "UPDATE jobs SET stage = ?, progress = ?, updated_at = ? "
+            "WHERE id = ? AND status = 'running' AND progress <= ?",
+            (stage, percent, time.time(), job_id, percent)
+        )
+
+def get_job(job_id):
+    with closing(_jobs_db()) as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def write_job_result(job_dir, word_document_buffer):
+    result_path = os.path.join(job_dir, "result.docx")
+    with open(result_path, "wb") as f:
+        f.write(word_document_buffer.getbuffer())
+    return result_path
+
+def remove_job_inputs(inputs):
+    for path in [inputs["video_path"], *inputs["audio_paths"], *inputs["image_paths"], *inputs["pdf_paths"]]:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+async def run_pv_job(job_id):
+    """Run the PV pipeline for a queued job and store the resulting .docx next to its inputs."""
+    job = await run_store(get_job, job_id)
+    if job is None:
+        return
+    inputs = json.loads(job["inputs"])
+    job_dir = inputs["job_dir"]
+    print(f"▶️ Starting PV job {job_id}") # Debug print
+    await run_store(update_job, job_id, status="running", stage="processing", progress=0)
+
+    def report(stage, percent):
+        # Called on the event loop: hand the SQLite write to the store executor without waiting for it
+        store_executor.submit(report_job_progress, job_id, stage, percent)
+
+    try:
+        meeting_info = json.loads(job["meeting_data"])
+        _, word_document_buffer = await build_pv_document(
+            meeting_info, job_dir, inputs["video_path"], inputs["audio_paths"],
+            inputs["image_paths"], inputs["pdf_paths"],
+            progress=report,
+            priority=PRIORITY_BACKGROUND,
+            session_id=job_id
+        )
+        result_path = await run_store(write_job_result, job_dir, word_document_buffer)
+        await run_store(update_job, job_id, status="done", stage="done", progress=100, result_path=result_path)
+        print(f"✅ PV job {job_id} completed") # Debug print
+    except Exception as e:
+        print(f"❌ PV job {job_id} failed: {str(e)}") # Debug print
+        await run_store(update_job, job_id, status="failed", error=str(e))
+    finally:
+        # The uploaded media are no longer needed once the job has finished
+        await run_store(remove_job_inputs, inputs)
+
+async def pv_job_worker(worker_id):
+    while True:
+        job_id = await pv_job_queue.get()
+        try:
+            await run_pv_job(job_id)
+        except Exception as e:
+            print(f"💥 PV job worker {worker_id} error on job {job_id}: {str(e)}")
+        finally:
+            pv_job_queue.task_done()
+
+def start_pv_job_workers():
+    """Create the job queue, requeue interrupted jobs and start the bounded worker pool."""
+    global pv_job_queue
+    pv_job_queue = asyncio.Queue(maxsize=PV_JOB_QUEUE_SIZE)
+    for job_id in init_job_store():
+        try:
+            pv_job_queue.put_nowait(job_id)
+            print(f"🔁 Requeued interrupted PV job {job_id}")
+        except asyncio.QueueFull:
+            update_job(job_id, status="failed", error="Job interrupted by a server restart.")
+    return [asyncio.create_task(pv_job_worker(worker_id)) for worker_id in range(PV_JOB_WORKERS)]
+
+# --- PV Sessions ---
+# The processed inputs of every generated PV are kept, so a PV can be regenerated after
+# editing the meeting data or adding files without processing the original media again.
+
+PV_SESSION_TTL = float(os.environ.get("PV_SESSION_TTL_DAYS", "7")) * 86400
+PV_SESSION_HEADER = "X-PV-Session-Id"
+
+def init_session_store():
+    """Create the session table and drop sessions older than PV_SESSION_TTL."""
+    os.makedirs(PV_JOBS_DIR, exist_ok=True)
+    with closing(_jobs_db()) as conn, conn:
+        conn.execute("""CREATE TABLE IF NOT EXISTS pv_sessions (
+            id TEXT PRIMARY KEY,
+            meeting_data TEXT NOT NULL,
+            sources TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )""")
+    prune_pv_sessions()
+
+def prune_pv_sessions():
+    with closing(_jobs_db()) as conn, conn:
+        conn.execute("DELETE FROM pv_sessions WHERE updated_at < ?", (time.time() - PV_SESSION_TTL,))
+
+def save_pv_session(session_id, meeting_info, sources):
+    now = time.time()
+    with closing(_jobs_db()) as conn, conn:
+        conn.execute(
+            "INSERT INTO pv_sessions (id, meeting_data, sources, created_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET meeting_data = excluded.meeting_data, sources = excluded.sources, "
+            "updated_at = excluded.updated_at",
+            (session_id, json.dumps(meeting_info, ensure_ascii=False), json.dumps(sources, ensure_ascii=False), now, now)
+        )
+
+def get_pv_session(session_id):
+    """Return {"meeting_info", "sources", "created_at", "updated_at"} of a session, or None."""
+    with closing(_jobs_db()) as conn:
+        row = conn.execute("SELECT * FROM pv_sessions WHERE id = ?", (session_id,)).fetchone()
+    if row is None:
+        return None
+    return {
+        "meeting_info": json.loads(row["meeting_data"]),
+        "sources": json.loads(row["sources"]),
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+def update_session_transcript(session_id, transcription_id, transcript):
+    """Splice the repaired transcript of a transcription run into the session that produced it.
+
+    Returns False when the session is gone or no longer uses this run.
+    """
+    with closing(_jobs_db()) as conn, conn:
+        row = conn.execute("SELECT sources FROM pv_sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return False
+        sources = json.loads(row["sources"])
+        transcription_ids = sources.get("transcription_ids") or {"video": None, "audio": []}
+        if transcription_ids["video"] == transcription_id:
+            sources["video_transcript"] = transcript
+        elif transcription_id in transcription_ids["audio"]:
+            sources["audio_transcripts_list"][transcription_ids["audio"].index(transcription_id)] = transcript
+        else:
+            return False
+        conn.execute(
+            "UPDATE pv_sessions SET sources = ?, updated_at = ? WHERE id = ?",
+            (json.dumps(sources, ensure_ascii=False), time.time(), session_id)
+        )
+    return True
+
+# --- Housekeeping ---
+# Expired transcription runs, jobs and sessions are pruned at startup and then every
+# CLEANUP_INTERVAL seconds, so a long-running server does not accumulate them.
+
+CLEANUP_INTERVAL = float(os.environ.get("CLEANUP_INTERVAL_SECONDS", "3600"))
+
+async def periodic_cleanup():
+    while True:
+        await asyncio.sleep(CLEANUP_INTERVAL)
+        for run, prune in ((run_blocking, prune_transcription_runs), (run_store, prune_pv_jobs),
+                           (run_store, prune_pv_sessions)):
+            try:
+                await run(prune)
+            except Exception as e:
+                print(f"⚠️ Cleanup {prune.__name__} failed: {str(e)}")
+
 # --- API Endpoints ---
 
+@app.get("/health")
+async def health():
+    """Liveness check; stays responsive while PV jobs run on the blocking executor."""
+    return {"status": "ok"}
+
+@app.get("/metrics")
+async def metrics():
+    """Runtime metrics of the shared API schedulers."""
+    return {
+        "whisper_scheduler": whisper_scheduler.stats(),
+        "openai_http": openai_connection_stats.stats(),
+        "gemini_generation": gemini_generation_stats.stats(),
+        "ocr_preprocessing": image_preprocess_stats.stats(),
+    }
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters and sizes of the on-disk caches."""
+    return {
+        "transcripts": transcript_cache.stats(),
+        "ocr": ocr_cache.stats(),
+        "pdf": pdf_cache.stats(),
+        "pv_summaries": pv_summary_cache.stats(),
+    }
+
 @app.post("/transcribe_video")
 async def transcribe_video(
     video: Optional[UploadFile] = File(None),
@@ -1002,47 +3429,41 @@ async def transcribe_video(
                         written_size += len(chunk)
                 print(f"Video saved to: {video_temp_path}, written size: {written_size} bytes")
             elif drive_url:
+                # Download, extract and transcribe in one streaming pass
                 print(f"Processing drive URL: {drive_url}")
-                video_temp_path = os.path.join(temp_dir, "downloaded_video.mp4")
-                ok, err = download_video_from_drive(drive_url, video_temp_path)
-                if not ok:
-                    print(f"Drive download failed: {err}")
+                manifest = TranscriptionManifest(source=drive_url)
+                transcript_segments, err = await run_blocking(transcribe_drive_video, drive_url, temp_dir, manifest=manifest)
+                if err:
+                    print(f"Drive video processing failed: {err}")
                     return JSONResponse(status_code=400, content={"error": err})
+                print("Number of segments:", len(transcript_segments))
+                print("Transcription completed successfully")
+                return {"transcript": "\n".join(transcript_segments), "transcription_id": manifest.run_id}
             else:
                 print("No video file or drive_url provided")
                 return JSONResponse(status_code=400, content={"error": "No video file or drive_url provided."})
             
             # 2. Verify video
             print("Verifying video file...")
-            valid, err = verify_video_file(video_temp_path)
+            valid, err = await run_blocking(verify_video_file, video_temp_path)
             if not valid:
                 print(f"Video verification failed: {err}")
                 return JSONResponse(status_code=400, content={"error": err})
             
-            # 3. Extract audio
-            print("Extracting audio...")
-            audio_path = os.path.join(temp_dir, "output_audio.mp3")
-            ok, err = extract_audio_from_video(video_temp_path, audio_path)
-            if not ok:
-                print(f"Audio extraction failed: {err}")
-                return JSONResponse(status_code=400, content={"error": err})
-            
-            # 4. Segment audio
-            print("Segmenting audio...")
-            segments = segment_audio(audio_path)
-            if not segments:
-                print("Audio segmentation failed")
-                return JSONResponse(status_code=400, content={"error": "Audio segmentation failed."})
-            
-            # 5. Transcribe segments
-            print("Transcribing segments...")
+            # 3-5. Extract Whisper-ready chunks straight from the video and transcribe them as they are produced
+            print("Extracting, segmenting and transcribing audio...")
             print("Video temp path:", video_temp_path)
-            print("Audio path:", audio_path)
-            print("Number of segments:", len(segments))
-            transcript_segments = transcribe_audio_segments(segments)
+            manifest = TranscriptionManifest(source=video.filename)
+            transcript_segments = await run_blocking(
+                transcribe_audio_file, video_temp_path, chunk_format=WHISPER_CHUNK_FORMAT, manifest=manifest
+            )
+            if not transcript_segments:
+                print("Audio extraction failed")
+                return JSONResponse(status_code=400, content={"error": "Audio extraction failed."})
+            print("Number of segments:", len(transcript_segments))
             transcript = "\n".join(transcript_segments)
             print("Transcription completed successfully")
-            return {"transcript": transcript}
+            return {"transcript": transcript, "transcription_id": manifest.run_id}
             
         except Exception as e:
             print(f"Error in transcribe_video: {str(e)}")
@@ -1067,63 +3488,147 @@ async def transcribe_audio(audio: Optional[UploadFile] = File(None)):
                         break
                     out_file.write(chunk)
 
-            # 2. Convertir en MP3 si besoin
-            if ext != ".mp3":
-                converted_audio_path = os.path.join(temp_dir, "converted_audio.mp3")
-                convert_cmd = [
-                    "ffmpeg", "-y", "-i", audio_temp_path,
-                    "-acodec", "libmp3lame", "-ar", "44100", "-b:a", "192k",
-                    converted_audio_path
-                ]
-                subprocess.run(convert_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                audio_path = converted_audio_path
-            else:
-                audio_path = audio_temp_path
-
-            # 3. Segmenter
-            segments = segment_audio(audio_path)
-            if not segments:
+            # 2-3. Découper directement le fichier d'origine (ffmpeg lit tous les conteneurs) en
+            # morceaux prêts pour Whisper et les transcrire au fil de l'eau
+            print("Audio path:", audio_temp_path)
+            manifest = TranscriptionManifest(source=audio.filename)
+            transcript_segments = await run_blocking(
+                transcribe_audio_file, audio_temp_path, chunk_format=WHISPER_CHUNK_FORMAT, manifest=manifest
+            )
+            if not transcript_segments:
                 return JSONResponse(status_code=400, content={"error": "Échec de la segmentation audio."})
 
-            # 4. Transcrire
-            print("Audio path:", audio_path)
-            print("Segments:", segments)
-            
-            transcript_segments = transcribe_audio_segments(segments)
             transcript = "\n".join(transcript_segments)
 
-            return {"transcription": transcript}
+            return {"transcription": transcript, "transcription_id": manifest.run_id}
 
         except Exception as e:
             return JSONResponse(status_code=500, content={"error": str(e)})
 
 
+@app.post("/transcribe_video/stream")
+async def transcribe_video_stream(
+    video: Optional[UploadFile] = File(None),
+    drive_url: Optional[str] = Form(None)
+):
+    """Same as /transcribe_video, streaming progress and transcript segments as Server-Sent Events."""
+    if video is None and not drive_url:
+        return JSONResponse(status_code=400, content={"error": "No video file or drive_url provided."})
+
+    temp_dir = tempfile.mkdtemp()
+    video_temp_path = None
+    if video is not None:
+        ext = os.path.splitext(video.filename)[1].lower() if video.filename else '.mp4'
+        video_temp_path = os.path.join(temp_dir, f"uploaded_video{ext}")
+        try:
+            await save_upload(video, video_temp_path)
+        except Exception as e:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            return JSONResponse(status_code=500, content={"error": str(e)})
+
+    manifest = TranscriptionManifest(source=drive_url or video.filename)
+
+    def pipeline(events):
+        if drive_url:
+            transcript_segments, err = transcribe_drive_video(drive_url, temp_dir, events=events, manifest=manifest)
+            return {"transcript": "\n".join(transcript_segments), "transcription_id": manifest.run_id}, err
+        valid, err = verify_video_file(video_temp_path)
+        if not valid:
+            return None, err
+        transcript_segments = transcribe_audio_file(
+            video_temp_path, chunk_format=WHISPER_CHUNK_FORMAT, events=events, manifest=manifest
+        )
+        if not transcript_segments:
+            return None, "Audio extraction failed."
+        return {"transcript": "\n".join(transcript_segments), "transcription_id": manifest.run_id}, None
+
+    return stream_pipeline_events(pipeline, temp_dir)
+
+@app.post("/transcribe_audio/stream")
+async def transcribe_audio_stream_events(audio: Optional[UploadFile] = File(None)):
+    """Comme /transcribe_audio, en envoyant la progression et les segments transcrits en Server-Sent Events."""
+    if audio is None:
+        return JSONResponse(status_code=400, content={"error": "Aucun fichier audio fourni."})
+
+    temp_dir = tempfile.mkdtemp()
+    ext = os.path.splitext(audio.filename)[1].lower() if audio.filename else '.mp3'
+    audio_temp_path = os.path.join(temp_dir, f"uploaded_audio{ext}")
+    try:
+        await save_upload(audio, audio_temp_path)
+    except Exception as e:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+    manifest = TranscriptionManifest(source=audio.filename)
+
+    def pipeline(events):
+        # Any input format is encoded straight into Whisper-ready chunks, no MP3 conversion needed
+        transcript_segments = transcribe_audio_file(
+            audio_temp_path, chunk_format=WHISPER_CHUNK_FORMAT, events=events, manifest=manifest
+        )
+        if not transcript_segments:
+            return None, "Échec de la segmentation audio."
+        return {"transcription": "\n".join(transcript_segments), "transcription_id": manifest.run_id}, None
+
+    return stream_pipeline_events(pipeline, temp_dir)
+
+transcription_retries = set()  # IDs of the runs being retried right now
+
+@app.get("/transcriptions/{transcription_id}")
+async def get_transcription(transcription_id: str):
+    """Manifest of a transcription run: chunk IDs, hashes, offsets, status and text."""
+    manifest = await run_blocking(TranscriptionManifest.load, transcription_id)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Transcription not found.")
+    return {**manifest.to_dict(), "failed": [chunk["id"] for chunk in manifest.failed_chunks()]}
+
+@app.post("/transcriptions/{transcription_id}/retry")
+async def retry_transcription(transcription_id: str):
+    """Re-run only the failed chunks of a previous transcription and return the repaired transcript."""
+    manifest = await run_blocking(TranscriptionManifest.load, transcription_id)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Transcription not found.")
+    if transcription_id in transcription_retries:
+        return JSONResponse(status_code=409, content={"error": "A retry of this transcription is already running."})
+    transcription_retries.add(transcription_id)
+    try:
+        retried = await run_blocking(retry_failed_chunks, manifest)
+    finally:
+        transcription_retries.discard(transcription_id)
+    transcript = "\n".join(manifest.transcript_segments())
+    # Runs of a PV pipeline also repair the transcript stored in their PV session
+    session_updated = bool(manifest.session_id) and await run_store(
+        update_session_transcript, manifest.session_id, transcription_id, transcript
+    )
+    return {
+        "transcription_id": transcription_id,
+        "retried": retried,
+        "failed": [chunk["id"] for chunk in manifest.failed_chunks()],
+        "transcript": transcript,
+        "session_id": manifest.session_id if session_updated else None,
+    }
+
 @app.post("/ocr_handwritten")
 async def ocr_handwritten(images: List[UploadFile] = File(...)):
     """Transcrit le texte manuscrit à partir d'une ou bien plusieurs images."""
     try:
-        results = {}
-        for image in images:
-            try:
-                # Lire le contenu de l'image
-                image_bytes = await image.read()
-                
-                # Traiter l'image
-                transcription = process_handwritten_image(image_bytes)
-                
-                # Stocker le résultat
-                results[image.filename] = {
-                    "success": True,
-                    "text": transcription
-                }
-                
-            except Exception as e:
-                results[image.filename] = {
-                    "success": False,
-                    "error": str(e)
-                }
-        
-        return {"results": results}
+        # Lire le contenu des images
+        images_bytes = [await image.read() for image in images]
+
+        # Traiter les images en parallèle
+        started_at = time.perf_counter()
+        pages = await ocr_handwritten_batch(images_bytes)
+        total_ms = round((time.perf_counter() - started_at) * 1000)
+
+        # Stocker les résultats, dans l'ordre des images
+        for image, page in zip(images, pages):
+            page["filename"] = image.filename
+        results = {
+            page["filename"]: {key: value for key, value in page.items() if key != "filename"}
+            for page in pages
+        }
+
+        return {"results": results, "pages": pages, "duration_ms": total_ms}
         
     except Exception as e:
         return JSONResponse(
@@ -1139,7 +3644,7 @@ async def extract_pdf(pdf: UploadFile = File(...)):
         pdf_bytes = await pdf.read()
         
         # Traiter le PDF
-        result = process_pdf(pdf_bytes)
+        result = await run_blocking(process_pdf, pdf_bytes)
         
         # Ajouter le nom du fichier au résultat
         result["filename"] = pdf.filename
@@ -1160,8 +3665,6 @@ async def generate_pv(
     images: List[UploadFile] = File([]),
     pdfs: List[UploadFile] = File([]),
 ):
-    # Placeholder: implement PV generation logic
-
     # 1. Receive and parse meeting data
     try:
         meeting_info = json.loads(meetingData)
@@ -1169,236 +3672,227 @@ async def generate_pv(
     except json.JSONDecodeError:
         return JSONResponse(status_code=400, content={"error": "Invalid meeting data format."})
 
-    # Access Google Drive URL if present
-    google_drive_url = meeting_info.get("googleDriveUrl")
-
     # Create a temporary directory to store uploaded files
     with tempfile.TemporaryDirectory() as temp_dir:
         print(f"Created temporary directory: {temp_dir}") # Debug print
-        video_path = None
-        audio_paths = []
-        image_paths = []
-        pdf_paths = []
 
         # 2. Save uploaded files to the temporary directory
         try:
-            # Save Video File
-            if video:
-                video_filename = video.filename if video.filename else "video.mp4"
-                video_path = os.path.join(temp_dir, video_filename)
-                with open(video_path, 'wb') as f:
-                    while True:
-                        chunk = await video.read(1024 * 1024)
-                        if not chunk:
-                            break
-                        f.write(chunk)
-                print(f"Saved video to: {video_path}") # Debug print
-
-            # Save Audio Files
-            for i, audio_file in enumerate(audio):
-                audio_filename = audio_file.filename if audio_file.filename else f"audio_{i}.mp3"
-                audio_path = os.path.join(temp_dir, audio_filename)
-                with open(audio_path, 'wb') as f:
-                    while True:
-                        chunk = await audio_file.read(1024 * 1024)
-                        if not chunk:
-                            break
-                        f.write(chunk)
-                audio_paths.append(audio_path)
-                print(f"Saved audio file {i} to: {audio_path}") # Debug print
-
-            # Save Image Files
-            for i, image_file in enumerate(images):
-                image_filename = image_file.filename if image_file.filename else f"image_{i}.png"
-                image_path = os.path.join(temp_dir, image_filename)
-                with open(image_path, 'wb') as f:
-                    while True:
-                        chunk = await image_file.read(1024 * 1024)
-                        if not chunk:
-                            break
-                        f.write(chunk)
-                image_paths.append(image_path)
-                print(f"Saved image file {i} to: {image_path}") # Debug print
-
-            # Save PDF Files
-            for i, pdf_file in enumerate(pdfs):
-                pdf_filename = pdf_file.filename if pdf_file.filename else f"pdf_{i}.pdf"
-                pdf_path = os.path.join(temp_dir, pdf_filename)
-                with open(pdf_path, 'wb') as f:
-                    while True:
-                        chunk = await pdf_file.read(1024 * 1024)
-                        if not chunk:
-                            break
-                        f.write(chunk)
-                pdf_paths.append(pdf_path)
-                print(f"Saved PDF file {i} to: {pdf_path}") # Debug print
-
+            video_path, audio_paths, image_paths, pdf_paths = await save_pv_uploads(temp_dir, video, audio, images, pdfs)
         except Exception as e:
             print(f"Error saving uploaded files: {str(e)}") # Debug print
             return JSONResponse(status_code=500, content={"error": f"Failed to save uploaded files: {str(e)}"})
 
-        # --- Processing logic starts here ---
-        print("Starting media processing...") # Debug print
-        video_transcript = ""
-        audio_transcripts_list = [] # Use a list to store transcripts from multiple audio files
-        ocr_texts_list = [] # Use a list to store texts from multiple image files
-        pdf_results_list = [] # Use a list to store results from multiple PDF files
+        # 3. Process media, generate the PV text and create the Word document
+        session_id = uuid.uuid4().hex
+        _, word_document_buffer = await build_pv_document(
+            meeting_info, temp_dir, video_path, audio_paths, image_paths, pdf_paths, session_id=session_id
+        )
 
-        # Process Video (if uploaded) or Google Drive URL
-        if video_path or google_drive_url:
-            print("Processing video/Google Drive URL...") # Debug print
-            try:
-                 # Reuse logic from old transcribe_video endpoint
-                 if google_drive_url:
-                     # Download from Drive
-                     downloaded_video_path = os.path.join(temp_dir, "downloaded_video.mp4")
-                     ok, err = download_video_from_drive(google_drive_url, downloaded_video_path)
-                     if not ok:
-                         print(f"Drive download failed: {err}") # Debug print
-                         # Decide if this is a critical error or if we can continue with other media
-                         # For now, let's add an error placeholder to the transcript
-                         video_transcript = f"[Erreur de téléchargement Google Drive: {err}]"
-                         video_to_process_path = None # No video file to process further
-                     else:
-                          video_to_process_path = downloaded_video_path
-                          print(f"Downloaded video to: {video_to_process_path}") # Debug print
-                 else:
-                     # Use the uploaded video file
-                     video_to_process_path = video_path
-
-                 if video_to_process_path:
-                     # Verify video
-                     valid, err = verify_video_file(video_to_process_path)
-                     if not valid:
-                         print(f"Video verification failed: {err}") # Debug print
-                         video_transcript = f"[Erreur de vérification vidéo: {err}]"
-                     else:
-                          # Extract audio
-                          audio_from_video_path = os.path.join(temp_dir, "audio_from_video.mp3")
-                          ok, err = extract_audio_from_video(video_to_process_path, audio_from_video_path)
-                          if not ok:
-                              print(f"Audio extraction failed: {err}") # Debug print
-                              video_transcript = f"[Erreur d'extraction audio vidéo: {err}]"
-                          else:
-                               # Segment and transcribe audio from video
-                               segments = segment_audio(audio_from_video_path)
-                               if not segments:
-                                   print("Audio segmentation failed for video") # Debug print
-                                   video_transcript = "[Échec de la segmentation audio vidéo]"
-                               else:
-                                   transcript_segments = transcribe_audio_segments(segments)
-                                   video_transcript = "\n".join(transcript_segments)
-                                   print("Video transcription completed.") # Debug print
+        # 4. Stream the Word document from its buffer
+        return docx_response(
+            word_document_buffer, pv_filename(meeting_info), {PV_SESSION_HEADER: session_id}
+        )
 
-            except Exception as e:
-                 print(f"Error processing video/Google Drive URL: {str(e)}") # Debug print
-                 video_transcript = f"[Erreur de traitement vidéo/URL: {str(e)}]"
+@app.post("/generate_pv/stream", dependencies=[Depends(require_video_or_audio)])
+async def generate_pv_stream(
+    meetingData: str = Form(...),
+    video: Optional[UploadFile] = File(None),
+    audio: List[UploadFile] = File([]),
+    images: List[UploadFile] = File([]),
+    pdfs: List[UploadFile] = File([]),
+):
+    """Same as /generate_pv, streaming progress and the PV text as Gemini writes it (Server-Sent Events)."""
+    try:
+        meeting_info = json.loads(meetingData)
+    except json.JSONDecodeError:
+        return JSONResponse(status_code=400, content={"error": "Invalid meeting data format."})
 
-        # Process Audio Files
-        if audio_paths:
-            print(f"Processing {len(audio_paths)} audio file(s)...") # Debug print
-            for i, audio_file_path in enumerate(audio_paths):
-                try:
-                    # Reuse logic from old transcribe_audio endpoint (saving, converting, segmenting, transcribing)
-                    # Note: saving is already done, so start from convert if needed
-                    
-                    # Check extension and convert if needed (simplified here, could be more robust)
-                    ext = os.path.splitext(audio_file_path)[1].lower()
-                    processed_audio_path = audio_file_path
-                    if ext not in [".mp3", ".wav", ".aac", ".flac", ".m4a"]:
-                        # Simple conversion attempt - might need more specific logic
-                        converted_audio_path = os.path.join(temp_dir, f"converted_audio_{i}.mp3")
-                        convert_cmd = [
-                            "ffmpeg", "-y", "-i", audio_file_path,
-                            "-acodec", "libmp3lame", "-ar", "44100", "-b:a", "192k",
-                            converted_audio_path
-                        ]
-                        # Note: In a real app, you might want to check return code and handle errors
-                        subprocess.run(convert_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                        processed_audio_path = converted_audio_path
-                        print(f"Converted audio file {i} to MP3: {processed_audio_path}") # Debug print
-                    
-                    segments = segment_audio(processed_audio_path)
-                    if not segments:
-                        print(f"Audio segmentation failed for file {i}") # Debug print
-                        audio_transcripts_list.append(f"[Échec de la segmentation audio fichier {i}]")
-                    else:
-                        transcript_segments = transcribe_audio_segments(segments)
-                        audio_transcripts_list.append("\n".join(transcript_segments))
-                        print(f"Audio transcription completed for file {i}.") # Debug print
+    temp_dir = tempfile.mkdtemp()
+    try:
+        video_path, audio_paths, image_paths, pdf_paths = await save_pv_uploads(temp_dir, video, audio, images, pdfs)
+    except Exception as e:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return JSONResponse(status_code=500, content={"error": f"Failed to save uploaded files: {str(e)}"})
 
-                except Exception as e:
-                     print(f"Error processing audio file {i}: {str(e)}") # Debug print
-                     audio_transcripts_list.append(f"[Erreur de traitement audio fichier {i}: {str(e)}]")
+    stream = EventStream()
+    session_id = uuid.uuid4().hex
 
-        # Process Image Files
-        if image_paths:
-            print(f"Processing {len(image_paths)} image file(s)...") # Debug print
-            for i, image_file_path in enumerate(image_paths):
-                try:
-                    # Read image bytes from saved file
-                    with open(image_file_path, "rb") as f:
-                         image_bytes = f.read()
-                    
-                    # Process image for OCR
-                    ocr_text = process_handwritten_image(image_bytes)
-                    ocr_texts_list.append(ocr_text)
-                    print(f"OCR processing completed for image {i}.") # Debug print
+    async def run():
+        try:
+            generated_pv_text, word_document_buffer = await build_pv_document(
+                meeting_info, temp_dir, video_path, audio_paths, image_paths, pdf_paths,
+                progress=lambda stage, percent: stream.emit("progress", {"stage": stage, "progress": percent}),
+                on_text=lambda text: stream.emit("text", {"text": text}),
+                session_id=session_id
+            )
+            stream.emit("done", {
+                "session_id": session_id,
+                "pv_text": generated_pv_text,
+                "filename": pv_filename(meeting_info),
+                "document": base64.b64encode(word_document_buffer.getbuffer()).decode("ascii"),
+            })
+        except StreamClosed:
+            print("⚠️ Client disconnected, PV generation stopped")
+        except Exception as e:
+            print(f"❌ Streaming PV generation failed: {str(e)}")
+            try:
+                stream.emit("error", {"error": str(e)})
+            except StreamClosed:
+                pass
+        finally:
+            await run_blocking(shutil.rmtree, temp_dir, ignore_errors=True)
+
+    task = asyncio.create_task(run())
+    streaming_tasks.add(task)
+    task.add_done_callback(streaming_tasks.discard)
+    return event_stream_response(stream)
+
+@app.get("/pv_sessions/{session_id}")
+async def get_pv_session_info(session_id: str):
+    """Meeting data and transcription run IDs of a PV session."""
+    session = await run_store(get_pv_session, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="PV session not found.")
+    return {
+        "session_id": session_id,
+        "meeting_data": session["meeting_info"],
+        "transcription_ids": session["sources"].get("transcription_ids"),
+        "created_at": session["created_at"],
+        "updated_at": session["updated_at"],
+    }
+
+@app.post("/pv_sessions/{session_id}/regenerate")
+async def regenerate_pv(
+    session_id: str,
+    meetingData: Optional[str] = Form(None),
+    video: Optional[UploadFile] = File(None),
+    audio: List[UploadFile] = File([]),
+    images: List[UploadFile] = File([]),
+    pdfs: List[UploadFile] = File([]),
+):
+    """Regenerate the PV of a previous session with edited meeting data and/or extra files.
+
+    Only the new inputs are processed: a new video (or a changed Google Drive URL)
+    replaces the video transcript, extra audio, images and PDFs are appended to the
+    stored results. The other processed inputs are reused as they are.
+    """
+    session = await run_store(get_pv_session, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="PV session not found.")
+
+    if meetingData is None:
+        meeting_info = session["meeting_info"]
+    else:
+        try:
+            meeting_info = json.loads(meetingData)
+            print(f"Received meeting data: {meeting_info}") # Debug print
+        except json.JSONDecodeError:
+            return JSONResponse(status_code=400, content={"error": "Invalid meeting data format."})
 
-                except Exception as e:
-                     print(f"Error processing image file {i}: {str(e)}") # Debug print
-                     ocr_texts_list.append(f"[Erreur de traitement image fichier {i}: {str(e)}]")
+    # The video is processed again only when it changed
+    google_drive_url = meeting_info.get("googleDriveUrl")
+    if video is not None or google_drive_url == session["meeting_info"].get("googleDriveUrl"):
+        google_drive_url = None
 
-        # Process PDF Files
-        if pdf_paths:
-            print(f"Processing {len(pdf_paths)} PDF file(s)...") # Debug print
-            for i, pdf_file_path in enumerate(pdf_paths):
-                try:
-                    # Read PDF bytes from saved file
-                    with open(pdf_file_path, "rb") as f:
-                         pdf_bytes = f.read()
-                    
-                    # Process PDF
-                    pdf_result = process_pdf(pdf_bytes)
-                    pdf_results_list.append(pdf_result)
-                    print(f"PDF processing completed for file {i}.") # Debug print
+    with tempfile.TemporaryDirectory() as temp_dir:
+        try:
+            video_path, audio_paths, image_paths, pdf_paths = await save_pv_uploads(temp_dir, video, audio, images, pdfs)
+        except Exception as e:
+            print(f"Error saving uploaded files: {str(e)}") # Debug print
+            return JSONResponse(status_code=500, content={"error": f"Failed to save uploaded files: {str(e)}"})
 
-                except Exception as e:
-                     print(f"Error processing PDF file {i}: {str(e)}") # Debug print
-                     pdf_results_list.append({"summary": f"[Erreur de traitement PDF fichier {i}: {str(e)}]", "acronyms": {}})
+        def no_progress(stage, percent):
+            pass
 
-        # --- Processing logic ends here ---
+        new_sources = await process_pv_sources(
+            temp_dir, video_path, google_drive_url, audio_paths, image_paths, pdf_paths, no_progress,
+            session_id=session_id
+        )
+        sources = session["sources"]
+        transcription_ids = sources.setdefault("transcription_ids", {"video": None, "audio": []})
+        if video_path or google_drive_url:
+            sources["video_transcript"] = new_sources["video_transcript"]
+            transcription_ids["video"] = new_sources["transcription_ids"]["video"]
+        for key in ("audio_transcripts_list", "ocr_texts_list", "pdf_results_list"):
+            sources[key] = sources[key] + new_sources[key]
+        transcription_ids["audio"] = transcription_ids["audio"] + new_sources["transcription_ids"]["audio"]
+        await run_store(save_pv_session, session_id, meeting_info, sources)
 
-        # --- PV Generation logic will go here ---
-        print("Starting PV generation...") # Debug print
+        _, word_document_buffer = await render_pv_document(meeting_info, sources, no_progress)
 
-        # Call the new function to generate PV text
-        generated_pv_text = await generate_pv_text_with_gemini(
-            meeting_info,
-            video_transcript,
-            audio_transcripts_list,
-            ocr_texts_list,
-            pdf_results_list
+        return docx_response(
+            word_document_buffer, pv_filename(meeting_info), {PV_SESSION_HEADER: session_id}
         )
 
-        # --- Return response ---
-        print("PV generation process completed.") # Debug print
-
-        # 3. Create Word document
-        print("Creating Word document...") # Debug print
-        word_document_buffer = create_word_pv_document(generated_pv_text, meeting_info)
+@app.post("/jobs/generate_pv", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_video_or_audio)])
+async def submit_pv_job(
+    meetingData: str = Form(...),
+    video: Optional[UploadFile] = File(None),
+    audio: List[UploadFile] = File([]),
+    images: List[UploadFile] = File([]),
+    pdfs: List[UploadFile] = File([]),
+):
+    """Queue a PV generation job and return its ID immediately."""
+    try:
+        json.loads(meetingData)
+    except json.JSONDecodeError:
+        return JSONResponse(status_code=400, content={"error": "Invalid meeting data format."})
 
-        # 4. Return Word document as a StreamingResponse
-        date_for_filename = meeting_info.get('date', 'N/A').replace('/', '_').replace('-', '_')
-        filename = f"Procès-Verbal_{date_for_filename}.docx"
+    if pv_job_queue.full():
+        return JSONResponse(status_code=503, content={"error": "Too many PV jobs queued, please retry later."})
 
-        return StreamingResponse(
-            iter([word_document_buffer.getvalue()]),
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            headers={
-                "Content-Disposition": f'attachment; filename="{filename}"'
-            }
-        )
+    job_id = uuid.uuid4().hex
+    job_dir = os.path.join(PV_JOBS_DIR, job_id)
+    os.makedirs(job_dir)
+    try:
+        video_path, audio_paths, image_paths, pdf_paths = await save_pv_uploads(job_dir, video, audio, images, pdfs)
+    except Exception as e:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        return JSONResponse(status_code=500, content={"error": f"Failed to save uploaded files: {str(e)}"})
+
+    await run_store(create_job, job_id, meetingData, {
+        "job_dir": job_dir,
+        "video_path": video_path,
+        "audio_paths": audio_paths,
+        "image_paths": image_paths,
+        "pdf_paths": pdf_paths,
+    })
+    try:
+        pv_job_queue.put_nowait(job_id)
+    except asyncio.QueueFull:
+        await run_store(update_job, job_id, status="failed", error="Job queue full.")
+        return JSONResponse(status_code=503, content={"error": "Too many PV jobs queued, please retry later."})
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/jobs/{job_id}")
+async def get_pv_job_status(job_id: str):
+    """Report the status, current stage and percent done of a PV job."""
+    job = await run_store(get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": job["progress"],
+        "error": job["error"],
+        # The job's processed inputs are kept as a PV session under the job ID
+        "session_id": job_id if job["status"] == "done" else None,
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+@app.get("/jobs/{job_id}/result")
+async def get_pv_job_result(job_id: str):
+    """Serve the .docx produced by a finished PV job."""
+    job = await run_store(get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if job["status"] != "done":
+        return JSONResponse(status_code=409, content={"error": f"Job is {job['status']}.", "status": job["status"]})
+    meeting_info = json.loads(job["meeting_data"])
+    return FileResponse(job["result_path"], media_type=DOCX_MEDIA_TYPE, filename=pv_filename(meeting_info))
 
 # Uncomment to run directly
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+"""Benchmarks of the CPU-bound stages of the PV pipeline.
+
+    python benchmarks.py benchmark-ocr photo1.jpg photo2.png ...
+    python benchmarks.py benchmark-pv-parser [sections ...]
+    python benchmarks.py benchmark-docx-template [documents]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+from app import (
+    build_pv_document_template, create_word_pv_document, get_pv_document_template, parse_pv_sections
+)
+from image_preprocessing import preprocess_ocr_image
+
+def synthetic_pv_text(section_count):
+    """A generated-looking PV with `section_count` repetitions of every section, for benchmarks."""
+    blocks = ["PROCES VERBAL DE LA RÉUNION DU CONSEIL D'ADMINISTRATION", "Séance du 12 mars 2024", ""]
+    for i in range(section_count):
+        blocks += [
+            "SONT PRESENTS OU REPRESENTES :", f"- M. Administrateur {i}", f"- Mme Administratrice {i}", "",
+            "Est Absent Excusé :", "-", "",
+            "ORDRE DU JOUR:", f"1. Point {i} de l'ordre du jour", "",
+            "DÉROULÉ ET DÉCISIONS", f"Le Conseil examine le point {i} et approuve la résolution {i}.", "",
+            "CONCLUSION", "Aucune conclusion formelle enregistrée.", "",
+            "ACRONYMES", "TMPA: Tanger Med Port Authority", "",
+        ]
+    return "\n".join(blocks)
+
+def benchmark_pv_parser(section_counts=(100, 1000, 10000)):
+    """Time parse_pv_sections and create_word_pv_document on synthetic PVs of growing size."""
+    for section_count in section_counts:
+        pv_text = synthetic_pv_text(section_count)
+        line_count = pv_text.count("\n") + 1
+        started_at = time.perf_counter()
+        parse_pv_sections(pv_text)
+        parsed_at = time.perf_counter()
+        create_word_pv_document(pv_text, {"date": "2024-03-12"})
+        built_at = time.perf_counter()
+        print(f"{line_count} lines: parse {(parsed_at - started_at) * 1000:.1f} ms "
+              f"({(parsed_at - started_at) / line_count * 1e6:.2f} µs/line), "
+              f"document {(built_at - parsed_at) * 1000:.0f} ms "
+              f"({(built_at - parsed_at) / line_count * 1e6:.1f} µs/line)")
+
+def benchmark_pv_document_template(document_count=100):
+    """Compare building each PV's fixed Word parts from scratch with copying the prebuilt template.
+
+    Both paths run create_word_pv_document on the same text: "scratch" passes it a freshly
+    built document, "template" lets it copy the template. Prints the mean time per document
+    and the peak memory allocated while building one.
+    """
+    pv_text = synthetic_pv_text(5)
+    meeting_info = {"date": "2024-03-12"}
+    get_pv_document_template()
+    paths = {
+        "scratch": lambda: create_word_pv_document(pv_text, meeting_info, build_pv_document_template()),
+        "template": lambda: create_word_pv_document(pv_text, meeting_info),
+    }
+    for name, build in paths.items():
+        build()  # Warm up
+        started_at = time.perf_counter()
+        for _ in range(document_count):
+            build()
+        seconds = (time.perf_counter() - started_at) / document_count
+        tracemalloc.start()
+        build()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name}: {seconds * 1000:.1f} ms/document, peak {peak / 1e6:.2f} MB allocated")
+
+def benchmark_ocr_preprocessing(paths):
+    """Affiche, pour chaque image, les octets économisés et la durée du prétraitement."""
+    total_in = total_out = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            image_bytes = f.read()
+        processed_bytes, mime_type, seconds = preprocess_ocr_image(image_bytes)
+        total_in += len(image_bytes)
+        total_out += len(processed_bytes)
+        saved = 1 - len(processed_bytes) / len(image_bytes) if image_bytes else 0
+        print(f"{os.path.basename(path)}: {len(image_bytes)} -> {len(processed_bytes)} octets "
+              f"({saved:.0%} économisés, {mime_type}) en {seconds * 1000:.0f} ms")
+    if total_in:
+        print(f"Total : {total_in} -> {total_out} octets ({1 - total_out / total_in:.0%} économisés) "
+              f"sur {len(paths)} image(s)")
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["benchmark-ocr"]:
+        benchmark_ocr_preprocessing(sys.argv[2:])
+    elif sys.argv[1:2] == ["benchmark-pv-parser"]:
+        benchmark_pv_parser([int(count) for count in sys.argv[2:]] or (100, 1000, 10000))
+    elif sys.argv[1:2] == ["benchmark-docx-template"]:
+        benchmark_pv_document_template(*[int(count) for count in sys.argv[2:3]])
+    else:
+        sys.exit(__doc__)
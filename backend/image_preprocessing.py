@@ -0,0 +1,64 @@
+# --- Prétraitement des images avant OCR ---
+# Les photos de téléphone (8-12 Mo) sont redressées selon l'EXIF, réduites à une résolution
+# suffisante pour lire l'écriture, passées en niveaux de gris et recompressées en JPEG
+# avant l'envoi à Gemini. Ce module n'a aucun effet de bord à l'import : les processus du
+# pool de prétraitement de app.py l'importent sans charger la configuration de l'API.
+
+import io
+import os
+import time
+
+from PIL import Image, ImageOps
+
+try:
+    # Les photos HEIC/HEIF (iPhone) ne se décodent qu'avec le plugin pillow-heif. L'enregistrement
+    # se fait ici, à l'import, pour qu'il ait lieu dans chaque processus du pool
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+OCR_MAX_IMAGE_SIDE = int(os.environ.get("OCR_MAX_IMAGE_SIDE", "2048"))
+OCR_JPEG_QUALITY = int(os.environ.get("OCR_JPEG_QUALITY", "80"))
+
+def sniff_image_mime_type(image_bytes):
+    """Détecte le vrai format d'une image d'après ses premiers octets."""
+    if image_bytes.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if image_bytes.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    if image_bytes[4:8] == b"ftyp":
+        brand = image_bytes[8:12]
+        if brand in (b"heic", b"heix", b"hevc", b"hevx"):
+            return "image/heic"
+        if brand in (b"mif1", b"msf1", b"heif"):
+            return "image/heif"
+    if image_bytes[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return "image/jpeg"
+
+def preprocess_ocr_image(image_bytes):
+    """Prépare une image pour l'OCR. Retourne (octets, type MIME, durée en secondes).
+
+    Si l'image ne peut pas être décodée (HEIC sans pillow-heif par exemple), ou si le
+    résultat n'est pas plus petit, l'image d'origine est renvoyée avec son vrai type MIME.
+    """
+    started_at = time.perf_counter()
+    mime_type = sniff_image_mime_type(image_bytes)
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            # Pour un JPEG, décode directement à une échelle réduite
+            image.draft("L", (OCR_MAX_IMAGE_SIDE, OCR_MAX_IMAGE_SIDE))
+            image = ImageOps.exif_transpose(image).convert("L")
+            image.thumbnail((OCR_MAX_IMAGE_SIDE, OCR_MAX_IMAGE_SIDE), Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, "JPEG", quality=OCR_JPEG_QUALITY, optimize=True)
+    except Exception as e:
+        print(f"⚠️ Prétraitement de l'image impossible, envoi de l'original : {str(e)}")
+        return image_bytes, mime_type, time.perf_counter() - started_at
+    processed_bytes = buffer.getvalue()
+    if len(processed_bytes) >= len(image_bytes) and mime_type == "image/jpeg":
+        processed_bytes = image_bytes
+    return processed_bytes, "image/jpeg", time.perf_counter() - started_at
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# Keep the caches, job store and transcription runs of the test session out of the real ones;
+# app.py reads these at import time
+_state_dir = tempfile.mkdtemp(prefix="pv_tests_")
+os.environ.setdefault("PV_CACHE_DIR", os.path.join(_state_dir, "cache"))
+os.environ.setdefault("PV_JOBS_DIR", os.path.join(_state_dir, "jobs"))
+os.environ.setdefault("PV_TRANSCRIPTION_RUNS_DIR", os.path.join(_state_dir, "transcriptions"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+
+import app
+
+SLOW_STAGE_SECONDS = 1.5
+MAX_HEALTH_LATENCY_SECONDS = 0.2
+
+
+def test_health_stays_responsive_while_a_pv_is_generated(monkeypatch):
+    def slow_transcription(i, audio_file_path, priority=app.PRIORITY_INTERACTIVE, manifest=None):
+        # Blocking work (ffmpeg + Whisper in production) that would freeze the event loop if run on it
+        time.sleep(SLOW_STAGE_SECONDS)
+        return "Transcription de test."
+
+    async def fake_generation(meeting_info, video_transcript, audio_transcripts_list, ocr_texts_list,
+                              pdf_results_list, on_text=None):
+        return "CONCLUSION\nLe Conseil approuve les comptes."
+
+    monkeypatch.setattr(app, "transcribe_audio_source", slow_transcription)
+    monkeypatch.setattr(app, "generate_pv_text_with_gemini", fake_generation)
+    # ASGITransport does not run the lifespan, which creates the session store
+    app.init_session_store()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            generation = asyncio.create_task(client.post(
+                "/generate_pv",
+                data={"meetingData": json.dumps({"date": "2024-03-12"})},
+                files={"audio": ("reunion.mp3", b"not really audio", "audio/mpeg")},
+            ))
+            # Let the request reach its blocking stage
+            await asyncio.sleep(0.2)
+
+            latencies = []
+            while not generation.done():
+                started_at = time.perf_counter()
+                response = await client.get("/health")
+                latencies.append(time.perf_counter() - started_at)
+                assert response.status_code == 200
+                await asyncio.sleep(0.1)
+            return await generation, latencies
+
+    pv_response, latencies = asyncio.run(scenario())
+
+    assert pv_response.status_code == 200
+    assert pv_response.headers["content-type"] == app.DOCX_MEDIA_TYPE
+    # /health was probed repeatedly while the PV was still being generated
+    assert len(latencies) >= 5
+    assert max(latencies) < MAX_HEALTH_LATENCY_SECONDS
+
+
+def test_cancelled_wait_for_a_provider_slot_leaks_no_permit(monkeypatch):
+    limit = app.ProviderLimit(2)
+    monkeypatch.setitem(app.provider_limits, "gemini", limit)
+
+    async def wait_then_cancel():
+        limit.acquire()
+        limit.acquire()
+        async def call():
+            async with app.provider_slot("gemini"):
+                pass
+        waiter = asyncio.create_task(call())
+        await asyncio.sleep(0.1)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        limit.release()
+        limit.release()
+
+    asyncio.run(wait_then_cancel())
+
+    # Both slots are free again and nobody is left waiting
+    assert (limit._available, len(limit._waiters)) == (2, 0)
+
+
+def test_released_slots_go_to_the_oldest_waiter_thread_or_coroutine():
+    limit = app.ProviderLimit(1)
+    order = []
+
+    def thread_call(name):
+        with limit:
+            order.append(name)
+
+    async def scenario():
+        limit.acquire()
+        threads = [threading.Thread(target=thread_call, args=(f"thread {i}",)) for i in range(3)]
+        threads[0].start()
+        await asyncio.sleep(0.05)
+
+        async def coroutine_call():
+            await limit.acquire_async()
+            order.append("coroutine")
+            limit.release()
+        coroutine = asyncio.create_task(coroutine_call())
+        await asyncio.sleep(0.05)
+        for thread in threads[1:]:
+            thread.start()
+        await asyncio.sleep(0.05)
+
+        limit.release()
+        await coroutine
+        await asyncio.to_thread(lambda: [thread.join() for thread in threads])
+
+    asyncio.run(scenario())
+
+    # The final PV call is not overtaken by OCR/PDF threads that started waiting after it
+    assert order[:2] == ["thread 0", "coroutine"]
+    assert sorted(order[2:]) == ["thread 1", "thread 2"]
+    assert (limit._available, len(limit._waiters)) == (1, 0)
@@ -0,0 +1,157 @@
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import app
+
+PART_SIZE = 64 * 1024
+CONTENT = os.urandom(5 * PART_SIZE + 1234)
+
+
+class RangeServer:
+    """Local stand-in for the Drive file server: answers Range requests and can fail chosen ones."""
+
+    def __init__(self, ranges=True):
+        self.ranges = ranges
+        self.failing_starts = set()  # Range starts answered with a 500
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                range_header = self.headers.get("Range")
+                server.requests.append(range_header)
+                match = re.fullmatch(r"bytes=(\d+)-(\d+)", range_header or "")
+                if not (server.ranges and match):
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(len(CONTENT)))
+                    self.end_headers()
+                    self.wfile.write(CONTENT)
+                    return
+                start, end = int(match.group(1)), int(match.group(2))
+                if start in server.failing_starts:
+                    self.send_response(500)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(CONTENT)}")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+                self.wfile.write(CONTENT[start:end + 1])
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/video.mp4"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def part_requests(self):
+        return [header for header in self.requests if header and header != "bytes=0-0"]
+
+
+@pytest.fixture
+def range_server():
+    server = RangeServer()
+    yield server
+    server.httpd.shutdown()
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_parallel_range_download(range_server, tmp_path):
+    output_path = str(tmp_path / "video.mp4")
+
+    ok, err, stats = app.download_file(range_server.url, output_path, workers=4, part_size=PART_SIZE)
+
+    assert ok, err
+    assert read(output_path) == CONTENT
+    assert stats["bytes"] == len(CONTENT)
+    assert len(range_server.part_requests()) == 6
+    assert not os.path.exists(output_path + ".tmp") and not os.path.exists(output_path + ".tmp.parts")
+
+
+def test_failed_download_resumes_from_the_parts_on_disk(range_server, tmp_path):
+    output_path = str(tmp_path / "video.mp4")
+    range_server.failing_starts = {2 * PART_SIZE}
+
+    ok, err, _ = app.download_file(range_server.url, output_path, part_size=PART_SIZE, max_retries=1)
+
+    assert not ok and "1 part(s) failed" in err
+    assert os.path.exists(output_path + ".tmp.parts")
+    range_server.failing_starts = set()
+    range_server.requests.clear()
+
+    ok, err, _ = app.download_file(range_server.url, output_path, part_size=PART_SIZE, max_retries=1)
+
+    assert ok, err
+    assert read(output_path) == CONTENT
+    assert range_server.part_requests() == [f"bytes={2 * PART_SIZE}-{3 * PART_SIZE - 1}"]
+
+
+def test_cut_sequential_download_resumes_with_ranges(range_server, tmp_path):
+    # What the streaming Drive path leaves behind when its single connection drops
+    output_path = str(tmp_path / "video.mp4")
+    received = 3 * PART_SIZE + 100
+    with open(output_path + ".tmp", "wb") as f:
+        f.write(CONTENT[:received])
+
+    app.keep_partial_download(output_path, received, len(CONTENT), part_size=PART_SIZE)
+    ok, err, _ = app.download_file(range_server.url, output_path, part_size=PART_SIZE)
+
+    assert ok, err
+    assert read(output_path) == CONTENT
+    # Only the parts the first connection did not finish are fetched
+    assert sorted(range_server.part_requests()) == [
+        f"bytes={3 * PART_SIZE}-{4 * PART_SIZE - 1}",
+        f"bytes={4 * PART_SIZE}-{5 * PART_SIZE - 1}",
+        f"bytes={5 * PART_SIZE}-{len(CONTENT) - 1}",
+    ]
+
+
+def test_drive_download_retries_and_resumes(range_server, tmp_path, monkeypatch):
+    output_path = str(tmp_path / "video.mp4")
+    range_server.failing_starts = {PART_SIZE}
+
+    class ResolvedDownload:
+        url = range_server.url
+
+        def close(self):
+            pass
+
+    def download_part_once(url, output_path, **kwargs):
+        # Fail the broken part on the first attempt, then let the server recover
+        result = original_download_file(url, output_path, part_size=PART_SIZE, max_retries=1, **kwargs)
+        range_server.failing_starts = set()
+        return result
+
+    original_download_file = app.download_file
+    monkeypatch.setattr(app, "open_drive_download", lambda url: (None, {}, ResolvedDownload(), None))
+    monkeypatch.setattr(app, "download_file", download_part_once)
+
+    ok, err = app.download_video_from_drive("https://drive.google.com/file/d/abc/view", output_path)
+
+    assert ok, err
+    assert read(output_path) == CONTENT
+    # Six parts on the first attempt, then only the failed one again
+    assert len(range_server.part_requests()) == 7
+
+
+def test_download_without_range_support(tmp_path):
+    server = RangeServer(ranges=False)
+    output_path = str(tmp_path / "video.mp4")
+    try:
+        ok, err, _ = app.download_file(server.url, output_path, part_size=PART_SIZE)
+    finally:
+        server.httpd.shutdown()
+
+    assert ok, err
+    assert read(output_path) == CONTENT
+    assert not os.path.exists(output_path + ".tmp")
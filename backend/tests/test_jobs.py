@@ -0,0 +1,67 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from contextlib import closing
+
+import httpx
+
+import app
+
+
+def new_job(status="running"):
+    job_id = uuid.uuid4().hex
+    app.init_job_store()
+    app.create_job(job_id, "{}", {"job_dir": os.path.join(app.PV_JOBS_DIR, job_id)})
+    app.update_job(job_id, status=status)
+    return job_id
+
+
+def test_late_progress_reports_do_not_move_a_job_backwards():
+    job_id = new_job()
+    app.report_job_progress(job_id, "generating", 80)
+    app.report_job_progress(job_id, "processing", 40)
+    assert (app.get_job(job_id)["stage"], app.get_job(job_id)["progress"]) == ("generating", 80)
+
+    app.update_job(job_id, status="done", stage="done", progress=100)
+    app.report_job_progress(job_id, "document", 95)
+    assert app.get_job(job_id)["stage"] == "done"
+
+
+def test_expired_jobs_are_pruned_with_their_files():
+    expired_id, recent_id = new_job("done"), new_job("done")
+    for job_id in (expired_id, recent_id):
+        os.makedirs(os.path.join(app.PV_JOBS_DIR, job_id))
+        open(os.path.join(app.PV_JOBS_DIR, job_id, "result.docx"), "wb").close()
+    with closing(app._jobs_db()) as conn, conn:
+        conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time() - app.PV_JOB_TTL - 60, expired_id))
+
+    app.prune_pv_jobs()
+
+    assert app.get_job(expired_id) is None
+    assert not os.path.exists(os.path.join(app.PV_JOBS_DIR, expired_id))
+    assert app.get_job(recent_id) is not None
+    assert os.path.exists(os.path.join(app.PV_JOBS_DIR, recent_id, "result.docx"))
+
+
+def test_job_status_answers_while_the_blocking_pool_is_saturated():
+    job_id = new_job()
+    released = threading.Event()
+    # Pipeline stages (OCR, PDF analysis waiting on the Gemini limit) holding every blocking thread
+    busy = [app.blocking_executor.submit(released.wait, 10) for _ in range(app.BLOCKING_WORKERS)]
+
+    async def poll():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.wait_for(client.get(f"/jobs/{job_id}"), timeout=2)
+
+    try:
+        response = asyncio.run(poll())
+    finally:
+        released.set()
+        for future in busy:
+            future.result()
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "running"
@@ -0,0 +1,46 @@
+import io
+import os
+import subprocess
+import sys
+
+from PIL import Image
+
+import app
+
+
+def photo_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (4000, 3000), "white").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_images_are_preprocessed_in_the_worker_pool():
+    try:
+        processed_bytes, mime_type = app.prepare_ocr_image(photo_bytes())
+    finally:
+        app.shutdown_image_preprocess_executor()
+
+    assert mime_type == "image/jpeg"
+    with Image.open(io.BytesIO(processed_bytes)) as image:
+        assert max(image.size) == app.OCR_MAX_IMAGE_SIDE
+        assert image.mode == "L"
+
+
+def test_preprocessing_module_does_not_load_the_app():
+    # Pool workers import image_preprocessing on their own: it must not pull in app.py and its API setup
+    loaded = subprocess.run(
+        [sys.executable, "-c", "import sys, image_preprocessing; print('app' in sys.modules, 'openai' in sys.modules)"],
+        cwd=os.path.dirname(app.__file__), capture_output=True, text=True, check=True,
+    ).stdout.split()
+    assert loaded == ["False", "False"]
+
+
+def test_preprocessing_module_registers_the_heif_opener(tmp_path):
+    # Pool workers only import image_preprocessing, so HEIC support must be registered there
+    (tmp_path / "pillow_heif.py").write_text("registered = []\ndef register_heif_opener():\n    registered.append(True)\n")
+    registered = subprocess.run(
+        [sys.executable, "-c", "import image_preprocessing, pillow_heif; print(pillow_heif.registered == [True])"],
+        cwd=os.path.dirname(app.__file__), env={**os.environ, "PYTHONPATH": str(tmp_path)},
+        capture_output=True, text=True, check=True,
+    ).stdout.split()
+    assert registered == ["True"]
@@ -0,0 +1,46 @@
+import io
+
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+import app
+
+
+def born_digital_pdf(lines):
+    """A one-page PDF whose text is in its text layer."""
+    writer = PdfWriter()
+    page = writer.add_blank_page(600, 800)
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)})
+    })
+    content = DecodedStreamObject()
+    content.set_data(("BT /F1 12 Tf 50 750 Td 14 TL " + " ".join(f"({line}) '" for line in lines) + " ET").encode("latin-1"))
+    page[NameObject("/Contents")] = writer._add_object(content)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def test_process_pdf_reads_born_digital_pdf_locally(monkeypatch):
+    def no_gemini(*args, **kwargs):
+        raise AssertionError("a PDF with a text layer must not be sent to Gemini")
+
+    monkeypatch.setattr(app, "analyze_pdf", no_gemini)
+    pdf_bytes = born_digital_pdf([
+        "Ordre du jour de la reunion du Conseil d'Administration (CA).",
+        "TMPA : Tanger Med Port Authority",
+        "Le Conseil approuve le budget presente par la Direction Generale.",
+    ])
+
+    result = app.process_pdf(pdf_bytes)
+
+    assert "Tanger Med Port Authority" in result["summary"]
+    assert "Erreur" not in result["summary"]
+    assert result["acronyms"]["TMPA"] == "Tanger Med Port Authority"
+    # pypdf may turn the straight apostrophe into a typographic one
+    assert result["acronyms"]["CA"] in ("Conseil d'Administration", "Conseil d’Administration")
@@ -0,0 +1,40 @@
+import concurrent.futures
+
+from docx import Document
+
+import app
+
+
+def read_document(buffer):
+    doc = Document(buffer)
+    return [paragraph.text for paragraph in doc.paragraphs], doc.sections[0].footer.paragraphs[-1].text
+
+
+def test_documents_copied_from_the_template_stay_independent():
+    texts = [f"DÉROULÉ ET DÉCISIONS\nLe Conseil approuve la résolution {i}." for i in range(8)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        buffers = list(executor.map(
+            lambda i: app.create_word_pv_document(texts[i], {"date": f"2024-03-1{i}"}), range(len(texts))
+        ))
+
+    for i, buffer in enumerate(buffers):
+        paragraphs, footer = read_document(buffer)
+        # Header spacer, then this PV's section, then the closing text
+        assert paragraphs[1:4] == ["DÉROULÉ ET DÉCISIONS", f"Le Conseil approuve la résolution {i}.", ""]
+        assert paragraphs[4].startswith("Le Conseil d'Administration confère tous pouvoirs")
+        assert paragraphs.count(f"Le Conseil approuve la résolution {i}.") == 1
+        assert footer == f"PV_CA_TMPA_2024_03_1{i}\t sur "
+    # The template itself never receives generated content
+    template = app.get_pv_document_template()
+    assert len(template.paragraphs) == len(read_document(buffers[0])[0]) - 3
+    assert template.sections[0].footer.paragraphs[-1].runs[0].text == app.PV_FOOTER_PREFIX
+
+
+def test_template_copy_matches_a_document_built_from_scratch():
+    pv_text = "CONCLUSION\nLe Conseil approuve les comptes.\nACRONYMES\nTMPA: Tanger Med Port Authority"
+    meeting_info = {"date": "2024/03/12"}
+
+    copied = app.create_word_pv_document(pv_text, meeting_info)
+    scratch = app.create_word_pv_document(pv_text, meeting_info, app.build_pv_document_template())
+
+    assert copied.getvalue() == scratch.getvalue()
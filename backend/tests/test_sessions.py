@@ -0,0 +1,66 @@
+import asyncio
+import uuid
+
+import httpx
+
+import app
+
+
+def failed_pv_run(tmp_path, session_id):
+    """Save a PV session whose audio transcript has a failed chunk, and the run it came from."""
+    manifest = app.TranscriptionManifest(source="reunion.mp3", session_id=session_id)
+    chunk_path = tmp_path / "chunk.mp3"
+    chunk_path.write_bytes(b"audio")
+    manifest.record(0, (str(chunk_path), 0.0, 120.0), "Le Conseil approuve les comptes.")
+    manifest.record(1, (str(tmp_path / "missing.mp3"), 120.0, 120.0), "[Segment 2 failed after 5 attempts]")
+    manifest.complete = True
+    manifest.save()
+
+    app.init_session_store()
+    app.save_pv_session(session_id, {"title": "CA"}, {
+        "video_transcript": "",
+        "audio_transcripts_list": ["\n".join(manifest.transcript_segments())],
+        "ocr_texts_list": [],
+        "pdf_results_list": [],
+        "transcription_ids": {"video": None, "audio": [manifest.run_id]},
+    })
+    return manifest
+
+
+def test_retrying_a_pv_run_repairs_the_session_transcript(tmp_path, monkeypatch):
+    session_id = uuid.uuid4().hex
+    manifest = failed_pv_run(tmp_path, session_id)
+    # The kept audio of the failed chunk, re-sent on retry
+    chunk = manifest.chunks[1]
+    chunk["audio_path"] = str(tmp_path / "chunk_0001.mp3")
+    open(chunk["audio_path"], "wb").close()
+    manifest.save()
+
+    def fake_stream(segments, **kwargs):
+        for j, segment in enumerate(segments):
+            yield j, segment, "Le budget 2027 est adopté."
+    monkeypatch.setattr(app, "transcribe_audio_stream", fake_stream)
+
+    async def retry():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            retried = await client.post(f"/transcriptions/{manifest.run_id}/retry")
+            session = await client.get(f"/pv_sessions/{session_id}")
+            return retried.json(), session.json()
+
+    retried, session = asyncio.run(retry())
+
+    assert retried["session_id"] == session_id
+    assert session["transcription_ids"]["audio"] == [manifest.run_id]
+    assert app.get_pv_session(session_id)["sources"]["audio_transcripts_list"] == [
+        "Le Conseil approuve les comptes.\nLe budget 2027 est adopté."
+    ]
+
+
+def test_runs_outside_the_session_leave_it_untouched(tmp_path):
+    session_id = uuid.uuid4().hex
+    failed_pv_run(tmp_path, session_id)
+
+    assert not app.update_session_transcript(session_id, uuid.uuid4().hex, "Autre texte.")
+    assert not app.update_session_transcript(uuid.uuid4().hex, uuid.uuid4().hex, "Autre texte.")
+    assert "failed" in app.get_pv_session(session_id)["sources"]["audio_transcripts_list"][0]
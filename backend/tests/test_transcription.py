@@ -0,0 +1,31 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize("filename", ["reunion.ogg", "reunion.webm", "reunion.mp3"])
+def test_uploaded_audio_is_chunked_from_the_original_file(filename, monkeypatch):
+    calls = []
+
+    def fake_transcription(audio_path, segment_length_ms=120000, chunk_format=None, **kwargs):
+        calls.append((os.path.basename(audio_path), chunk_format, sorted(os.listdir(os.path.dirname(audio_path)))))
+        return ["Le Conseil approuve les comptes."]
+
+    monkeypatch.setattr(app, "transcribe_audio_file", fake_transcription)
+
+    async def upload():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/transcribe_audio", files={"audio": (filename, b"audio bytes", "audio/ogg")})
+
+    response = asyncio.run(upload())
+
+    assert response.status_code == 200
+    assert response.json()["transcription"] == "Le Conseil approuve les comptes."
+    # No intermediate MP3: the upload itself is decoded into Whisper-ready chunks
+    extension = os.path.splitext(filename)[1]
+    assert calls == [(f"uploaded_audio{extension}", app.WHISPER_CHUNK_FORMAT, [f"uploaded_audio{extension}"])]
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import app
+
+RATE = app.VAD_SAMPLE_RATE
+
+
+def tone(seconds, amplitude=8000):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+
+
+def silence(seconds, seed=0):
+    # Low background noise, about -70 dBFS
+    return np.random.default_rng(seed).normal(0, 10, int(seconds * RATE)).astype(np.int16)
+
+
+def chunk(audio, block_size, **kwargs):
+    chunker = app.VoiceActivityChunker(**kwargs)
+    chunks = []
+    for start in range(0, len(audio), block_size):
+        chunks += chunker.feed(audio[start:start + block_size])
+    return chunks + chunker.flush(), chunker
+
+
+def test_long_speech_is_cut_into_chunks_no_longer_than_the_maximum():
+    audio = np.concatenate([tone(12), silence(0.5, seed=1), tone(14)])
+
+    chunks, _ = chunk(audio, RATE, max_chunk_sec=5)
+
+    assert len(chunks) >= 6
+    assert all(len(samples) <= 5 * RATE for samples, _ in chunks)
+    # The short pause is kept: only the trailing partial frame is left out
+    assert len(audio) - sum(len(samples) for samples, _ in chunks) < RATE * app.VAD_FRAME_MS // 1000
+
+
+def test_long_silences_are_dropped_and_spans_point_to_the_speech():
+    audio = np.concatenate([silence(4), tone(3), silence(6, seed=1), tone(2), silence(3, seed=2)])
+
+    chunks, chunker = chunk(audio, RATE, max_chunk_sec=60)
+
+    assert len(chunks) == 1
+    samples, spans = chunks[0]
+    padding = app.VAD_PADDING_SEC
+    assert spans == [
+        pytest.approx((4 - padding, 7 + padding), abs=0.04),
+        pytest.approx((13 - padding, 15 + padding), abs=0.04),
+    ]
+    assert len(samples) == chunker.kept_samples
+    assert sum(end - start for start, end in spans) == pytest.approx(len(samples) / RATE)
+    assert chunker.kept_samples < 0.5 * chunker.total_samples
+
+
+@pytest.mark.parametrize("block_size", [160, 480, 4097, RATE // 3])
+def test_chunks_do_not_depend_on_the_feed_block_size(block_size):
+    audio = np.concatenate([
+        silence(2), tone(4), silence(2, seed=1), tone(7), silence(0.5, seed=2), tone(3), silence(1.5, seed=3)
+    ])
+    reference, _ = chunk(audio, len(audio), max_chunk_sec=6)
+
+    chunks, _ = chunk(audio, block_size, max_chunk_sec=6)
+
+    assert len(reference) >= 3
+    assert [spans for _, spans in chunks] == [spans for _, spans in reference]
+    assert all(np.array_equal(a, b) for (a, _), (b, _) in zip(chunks, reference))
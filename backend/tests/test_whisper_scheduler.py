@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+import app
+
+
+class FakeClock:
+    """Stands in for app's `time` module: the scheduler only reads time.monotonic()."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(app, "time", clock)
+    return clock
+
+
+def test_token_bucket_refills_at_its_rate_up_to_capacity():
+    bucket = app.TokenBucket(60)  # One token per second
+    bucket.updated_at = 0.0
+    bucket.consume(60)
+
+    assert bucket.wait_time(1, now=0.0) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now=0.5) == pytest.approx(0.5)
+    assert bucket.wait_time(1, now=1.0) == 0.0
+    assert bucket.wait_time(60, now=1000.0) == 0.0
+    assert bucket.tokens == 60  # Capped at capacity
+
+
+def test_token_bucket_oversized_requests_wait_for_a_full_bucket_and_are_paid_back():
+    bucket = app.TokenBucket(60)
+    bucket.updated_at = 0.0
+
+    assert bucket.wait_time(150, now=0.0) == 0.0
+    bucket.consume(150)
+    # 90 tokens in debt: the next call waits until the bucket is positive again
+    assert bucket.wait_time(1, now=0.0) == pytest.approx(91.0)
+
+
+def test_rate_limit_halves_concurrency_and_backs_off_exponentially(clock):
+    scheduler = app.WhisperScheduler(50, 7200, initial_concurrency=8, max_concurrency=16)
+    scheduler.acquire()
+
+    scheduler.release("rate_limited")
+
+    assert scheduler.limit == 4
+    assert clock.now + 5 <= scheduler.paused_until <= clock.now + 6
+    clock.now = scheduler.paused_until
+    for limit, backoff in ((2, 10), (1, 20), (1, 40)):
+        scheduler.acquire()
+        scheduler.release("rate_limited")
+        assert scheduler.limit == limit
+        assert clock.now + backoff <= scheduler.paused_until <= clock.now + backoff + 1
+        clock.now = scheduler.paused_until
+    assert scheduler.rate_limited == 4
+
+
+def test_retry_after_header_sets_the_pause(clock):
+    scheduler = app.WhisperScheduler(50, 7200, initial_concurrency=4, max_concurrency=16)
+    scheduler.acquire()
+
+    scheduler.release("rate_limited", {"retry-after-ms": "30000"})
+
+    assert scheduler.paused_until == clock.now + 30
+    assert scheduler.backoff == 5.0  # The provider's hint replaces the exponential backoff
+
+
+def test_successes_recover_concurrency_additively(clock):
+    scheduler = app.WhisperScheduler(1000, 72000, initial_concurrency=2, max_concurrency=4)
+
+    for expected in (2.5, 2.9):
+        scheduler.acquire()
+        scheduler.release("success")
+        assert scheduler.limit == pytest.approx(expected)
+    # About +1 per `limit` successes, capped at max_concurrency
+    for _ in range(20):
+        scheduler.acquire()
+        scheduler.release("success")
+    assert scheduler.limit == 4
+
+
+def test_acquire_waits_for_the_request_bucket_to_refill(clock):
+    scheduler = app.WhisperScheduler(2, 7200, initial_concurrency=4, max_concurrency=4)  # One request per 30 s
+    scheduler.acquire()
+    scheduler.acquire()
+    started = threading.Event()
+
+    def third_call():
+        scheduler.acquire()
+        started.set()
+
+    waiter = threading.Thread(target=third_call, daemon=True)
+    waiter.start()
+    time.sleep(0.1)
+    assert not started.is_set()
+
+    clock.now += 15
+    scheduler.release("success")  # Wakes the waiter, which re-checks the bucket
+    time.sleep(0.1)
+    assert not started.is_set()
+
+    clock.now += 15
+    with scheduler._cond:
+        scheduler._cond.notify_all()
+    assert started.wait(timeout=2)
+    assert scheduler.in_flight == 2